@@ -2,47 +2,154 @@
 Projeto de Computação Gráfica 2025/2026 
 """
 
+import sys, os, math, time
+
+# modo sem janela: a plataforma do PyOpenGL tem de ser escolhida antes do import
+if ('--headless' in sys.argv or '--batch' in sys.argv or '--trace' in sys.argv
+        or ('--benchmark' in sys.argv and '--window' not in sys.argv)):
+    os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+if os.environ.get('PYOPENGL_PLATFORM') == 'egl':
+    os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
+from OpenGL.GL import shaders
 from PIL import Image
-import sys, math, time
+import csv, ctypes, hashlib, json, struct
+import functools, queue, threading, types
+from collections import Counter, deque, namedtuple
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 
 # ---------- Config ----------
 WINDOW_W, WINDOW_H = 1200, 800
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
 
 # ---------- State ----------
 last_time = time.time()
-state = {
-    'car_pos': [0.0, 0.0, 0.0],
-    'car_heading': 0.0,
-    'car_speed': 0.0,
-    'steer_angle': 0.0,
-    'left_door_open': False,
-    'right_door_open': False,
-    'garage_open': False,
-    'camera_mode': 0,
-    'cam_azim': 30.0,
-    'cam_elev': 20.0,
-    'cam_dist': 5,
-    'show_help': True,
-    'wheel_spin': 0.0,
-    'wheel_rotation': 0.0
+
+def as_position(value):
+    return tuple(float(v) for v in value)
+
+# campo: (valor inicial, tipo); cada campo tem um bit na máscara de alterações
+STATE_FIELDS = {
+    'car_pos': ((0.0, 0.0, 0.0), as_position),
+    'car_heading': (0.0, float),
+    'car_speed': (0.0, float),
+    'steer_angle': (0.0, float),
+    'left_door_open': (False, bool),
+    'right_door_open': (False, bool),
+    'garage_open': (False, bool),
+    # progresso das animações: 0 fechada, 1 aberta
+    'left_door_anim': (0.0, float),
+    'right_door_anim': (0.0, float),
+    'garage_anim': (0.0, float),
+    'camera_mode': (0, int),
+    'cam_azim': (30.0, float),
+    'cam_elev': (20.0, float),
+    'cam_dist': (5.0, float),
+    'show_help': (True, bool),
+    'wheel_spin': (0.0, float),
+    'wheel_rotation': (0.0, float),
+    'compiled_body': (True, bool),
+    'frustum_culling': (True, bool),
+    'lod': (True, bool),
+    'instancing': (True, bool),
+    'car_zones': (True, bool),
+    'on_demand': (True, bool),
 }
+STATE_BITS = {name: 1 << i for i, name in enumerate(STATE_FIELDS)}
+
+def state_mask(fields):
+    mask = 0
+    for name in fields:
+        mask |= STATE_BITS[name]
+    return mask
+
+class State:
+    # leitura = acesso direto ao slot; a escrita converte o tipo, marca o bit
+    # do campo e invalida as caches que dependem dele
+    __slots__ = tuple(STATE_FIELDS) + ('dirty', 'watchers')
+
+    def __init__(self):
+        object.__setattr__(self, 'dirty', 0)
+        object.__setattr__(self, 'watchers', [])
+        for name, (value, _) in STATE_FIELDS.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        if name not in STATE_FIELDS:
+            raise AttributeError(f"campo de estado desconhecido: {name}")
+        value = STATE_FIELDS[name][1](value)
+        if value == getattr(self, name):
+            return
+        object.__setattr__(self, name, value)
+
+        bit = STATE_BITS[name]
+        object.__setattr__(self, 'dirty', self.dirty | bit)
+        for mask, callback in self.watchers:
+            if mask & bit:
+                callback()
+
+    def subscribe(self, fields, callback):
+        self.watchers.append((state_mask(fields), callback))
+
+    def take_dirty(self):
+        # campos alterados desde a última chamada
+        dirty = self.dirty
+        object.__setattr__(self, 'dirty', 0)
+        return dirty
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in STATE_FIELDS}
+
+    def update(self, values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+state = State()
 
 keys = { 'w': False, 'a': False, 's': False, 'd': False }
 
-door_base_top = (0,0,0)
-door_base_bottom = (0,0,0)
-door_base_rear = (0,0,0)
-door_rear_bottom = (0,0,0)
-
 # ---- movimento suave ----
 MOVE_STEP = 0.03
 TURN_FACTOR = 0.03
 STEER_STEP = 0.5
 WHEEL_SPIN_STEP = 4
 
+# ---- portas animadas ----
+DOOR_OPEN_ANGLE = 70.0
+GARAGE_OPEN_ANGLE = 100.0
+# (alvo, progresso, duração em segundos)
+ANIMATIONS = (
+    ('left_door_open', 'left_door_anim', 0.6),
+    ('right_door_open', 'right_door_anim', 0.6),
+    ('garage_open', 'garage_anim', 1.5),
+)
+SIM_TARGETS = tuple(target for target, _, _ in ANIMATIONS)
+
+# ---- simulação a passo fixo ----
+SIM_HZ = 120
+SIM_DT = 1.0 / SIM_HZ
+SIM_STEP_SCALE = 60.0 / SIM_HZ   # os passos acima são por atualização a 60 Hz
+MAX_SIM_STEPS = 8
+SIM_FIELDS = ('car_pos', 'car_heading', 'steer_angle', 'wheel_spin', 'wheel_rotation',
+              'left_door_anim', 'right_door_anim', 'garage_anim')
+
+FRAME_CAP = 60        # frames por segundo, 0 = sem limite
+sim_time = None
+sim_accumulator = 0.0
+sim_prev = sim_curr = None
+frame_interval = 0.0
+next_frame_time = 0.0
+window_visible = True
+idle_armed = False
+sim_worker = None
+
 
 # ---------- Materials ----------
 MATERIALS = {
@@ -62,6 +169,7 @@ MATERIALS = {
 
 textures = {}
 quadric = None
+body_lists = {}
 
 # ---------- Helpers ----------
 def set_material(name):
@@ -71,6 +179,23 @@ def set_material(name):
     glMaterialfv(GL_FRONT_AND_BACK, GL_SPECULAR, spec)
     glMaterialf(GL_FRONT_AND_BACK, GL_SHININESS, shin)
 
+# nível de detalhe corrente: 0 = completo, cada nível divide as subdivisões por 2
+LOD_LEVELS = 3
+lod_level = 0
+
+def lod(count, minimum=6):
+    return max(minimum, count >> lod_level)
+
+@contextmanager
+def lod_detail(level):
+    global lod_level
+    saved = lod_level
+    lod_level = level
+    try:
+        yield
+    finally:
+        lod_level = saved
+
 def init_quadric():
     global quadric
     if quadric is None:
@@ -78,34 +203,584 @@ def init_quadric():
         gluQuadricNormals(quadric, GLU_SMOOTH)
         gluQuadricTexture(quadric, GL_TRUE)
 
-def make_checker_texture(tile_count=16, tile_size=8):
-    size = tile_count * tile_size
-    img = Image.new('RGB', (size,size))
-    pixels = img.load()
-    for y in range(size):
-        for x in range(size):
-            tx = (x // tile_size) % 2
-            ty = (y // tile_size) % 2
-            if (tx ^ ty) == 0:
-                pixels[x,y] = (200,200,200)
-            else:
-                pixels[x,y] = (70,70,70)
-    return img
+# ---------- Procedural textures ----------
+# imagens RGB uint8 (altura, largura, 3) geradas com NumPy, todas em mosaico
+TEXTURE_CACHE_DIR = os.path.join(CACHE_DIR, 'textures')
+TEXTURE_VERSION = 1
+
+GROUND_TEXTURE = ('checker', {'size': 2048, 'tiles': 16})
+
+def checker_texture(size, tiles, light=(200,200,200), dark=(70,70,70)):
+    cell = (np.arange(size) * tiles // size) % 2
+    mask = (cell[:, None] ^ cell[None, :]) == 0
+    return np.where(mask[..., None], np.uint8(light), np.uint8(dark)).astype(np.uint8)
+
+def value_noise(size, cells, octaves=4, seed=0):
+    # ruído de valor fractal em [0, 1], interpolado e periódico nas bordas
+    rng = np.random.default_rng(seed)
+    out = np.zeros((size, size), np.float32)
+    amplitude = 1.0
+    total = 0.0
+    for octave in range(octaves):
+        n = cells * 2 ** octave
+        if n > size:
+            break
+        grid = rng.random((n, n), dtype=np.float32)
+
+        coords = np.arange(size, dtype=np.float32) * n / size
+        i0 = coords.astype(np.int64) % n
+        i1 = (i0 + 1) % n
+        t = coords - np.floor(coords)
+        t = t * t * (3 - 2 * t)
+
+        rows = grid[i0] * (1 - t)[:, None] + grid[i1] * t[:, None]
+        layer = rows[:, i0] * (1 - t)[None, :] + rows[:, i1] * t[None, :]
+
+        out += layer * amplitude
+        total += amplitude
+        amplitude *= 0.5
+    return out / total
+
+def asphalt_texture(size, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    noise = value_noise(size, 8, 6, seed)
+    grain = rng.random((size, size), dtype=np.float32)
+
+    gray = 55 + 40 * noise + 24 * (grain - 0.5)
+    gray = np.where(grain > 0.985, gray + 60, gray)   # pedrinhas claras
+
+    rgb = gray[..., None] * np.array([1.0, 1.0, 1.04], np.float32)
+    return np.clip(rgb, 0, 255).astype(np.uint8)
+
+def stripes_texture(size, count=8, width=0.5, light=(230,230,230), dark=(40,40,40), vertical=False):
+    phase = (np.arange(size) * count / size) % 1.0
+    mask = phase < width
+    mask = np.broadcast_to(mask[None, :] if vertical else mask[:, None], (size, size))
+    return np.where(mask[..., None], np.uint8(light), np.uint8(dark)).astype(np.uint8)
+
+def tiles_texture(size, tiles=8, grout=4, color=(180,170,160), grout_color=(90,90,90), seed=0):
+    rng = np.random.default_rng(seed)
+    tile_size = size // tiles
+    index = np.arange(size) // tile_size % tiles
+    inside = (np.arange(size) % tile_size) >= grout
+
+    # cada ladrilho com um tom ligeiramente diferente
+    shade = 0.85 + 0.3 * rng.random((tiles, tiles), dtype=np.float32)
+    tile = shade[index[:, None], index[None, :], None] * np.array(color, np.float32)
+
+    mask = inside[:, None] & inside[None, :]
+    rgb = np.where(mask[..., None], tile, np.array(grout_color, np.float32))
+    return np.clip(rgb, 0, 255).astype(np.uint8)
+
+def detail_texture(size, cells=16, strength=4.0, seed=0):
+    # mapa tipo normal map: relevo de ruído -> normais codificadas em RGB
+    height = value_noise(size, cells, 5, seed) * strength
+    dx = (np.roll(height, -1, axis=1) - np.roll(height, 1, axis=1)) * (size / 256.0)
+    dy = (np.roll(height, -1, axis=0) - np.roll(height, 1, axis=0)) * (size / 256.0)
+
+    normal = np.stack([-dx, -dy, np.ones_like(height)], axis=-1)
+    normal /= np.linalg.norm(normal, axis=-1, keepdims=True)
+    return ((normal * 0.5 + 0.5) * 255).astype(np.uint8)
+
+PROCEDURAL_TEXTURES = {
+    'checker': checker_texture,
+    'asphalt': asphalt_texture,
+    'stripes': stripes_texture,
+    'tiles': tiles_texture,
+    'detail': detail_texture,
+}
+
+# ---------- Mipmap cache ----------
+# ficheiro: cabeçalho + (largura, altura, offset) por nível + níveis RGB crus
+MIP_MAGIC = b'CGMIPS\0\0'
+MIP_VERSION = 1
+MIP_HEADER = struct.Struct('<8s3I')   # magic, versão, níveis, tamanho do cabeçalho
+MIP_LEVEL = struct.Struct('<3I')      # largura, altura, offset
+MIPMAP_FILTER = 'box'                 # 'box' (média 2x2) ou 'lanczos'
+
+def downsample(pixels, filter=MIPMAP_FILTER):
+    height, width = pixels.shape[:2]
+    size = (max(width // 2, 1), max(height // 2, 1))
+
+    if filter == 'box' and width % 2 == 0 and height % 2 == 0:
+        p = pixels.astype(np.uint16)
+        return ((p[0::2, 0::2] + p[1::2, 0::2] + p[0::2, 1::2] + p[1::2, 1::2] + 2) // 4).astype(np.uint8)
+
+    # lados ímpares (ou Lanczos): média por área exata do PIL
+    resample = Image.LANCZOS if filter == 'lanczos' else Image.BOX
+    return np.asarray(Image.fromarray(np.ascontiguousarray(pixels)).resize(size, resample))
+
+def mipmap_chain(pixels, filter=MIPMAP_FILTER):
+    # nível 0 já com as linhas de baixo para cima, como o OpenGL espera
+    levels = [np.ascontiguousarray(pixels[::-1], dtype=np.uint8)]
+    while levels[-1].shape[0] > 1 or levels[-1].shape[1] > 1:
+        levels.append(downsample(levels[-1], filter))
+    return levels
+
+def mip_cache_path(key, filter=MIPMAP_FILTER):
+    digest = hashlib.sha256(json.dumps([MIP_VERSION, filter, key], sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(TEXTURE_CACHE_DIR, 'mips_%s.bin' % digest)
+
+def save_mip_chain(path, levels):
+    header_len = MIP_HEADER.size + MIP_LEVEL.size * len(levels)
+    offset = (header_len + 15) & ~15
+    table = []
+    for pixels in levels:
+        table.append((pixels.shape[1], pixels.shape[0], offset))
+        offset += (pixels.nbytes + 15) & ~15
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MIP_HEADER.pack(MIP_MAGIC, MIP_VERSION, len(levels), header_len))
+        for entry in table:
+            f.write(MIP_LEVEL.pack(*entry))
+        for (_, _, level_offset), pixels in zip(table, levels):
+            f.seek(level_offset)
+            f.write(pixels.tobytes())
+        f.truncate(offset)
+    os.replace(tmp, path)
+
+def load_mip_chain(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            magic, version, count, header_len = MIP_HEADER.unpack(f.read(MIP_HEADER.size))
+            if magic != MIP_MAGIC or version != MIP_VERSION:
+                return None
+            table = [MIP_LEVEL.unpack(f.read(MIP_LEVEL.size)) for _ in range(count)]
+
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        return [data[offset:offset + width * height * 3].reshape(height, width, 3)
+                for width, height, offset in table]
+    except (OSError, struct.error, ValueError):
+        # ficheiro truncado ou corrompido: gerar de novo e reescrever
+        return None
+
+def cached_mip_chain(key, make_pixels, filter=MIPMAP_FILTER):
+    path = mip_cache_path(key, filter)
+    levels = load_mip_chain(path)
+    if levels is not None:
+        return levels
+
+    levels = mipmap_chain(make_pixels(), filter)
+    try:
+        save_mip_chain(path, levels)
+    except OSError as e:
+        print('cache de mipmaps indisponível:', e)
+    return levels
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def file_mip_chain(path):
+    # chave: conteúdo do ficheiro, não o nome nem a data
+    return cached_mip_chain(['file', file_hash(path)],
+                            lambda: np.asarray(Image.open(path).convert('RGB')))
+
+def procedural_mip_chain(kind, params):
+    return cached_mip_chain(['procedural', TEXTURE_VERSION, kind, params],
+                            lambda: PROCEDURAL_TEXTURES[kind](**params))
+
+def generate_all_textures(size=2048):
+    # aquece a mesma cache de mipmaps que o arranque lê
+    for kind in PROCEDURAL_TEXTURES:
+        params = dict(GROUND_TEXTURE[1]) if kind == GROUND_TEXTURE[0] else {'size': size}
+        start = time.perf_counter()
+        levels = procedural_mip_chain(kind, params)
+        print(f"{kind:<10}{levels[0].shape[1]}x{levels[0].shape[0]}  {len(levels)} níveis  "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+# ---------- Body geometry ----------
+# pontos e normais dos painéis calculados uma vez (não em cada frame)
+def vec(p):
+    return (float(p[0]), float(p[1]), float(p[2]))
+
+def mirror_x(p):
+    return (-p[0], p[1], p[2])
+
+def face_normal(a, b, c):
+    n = np.cross(np.subtract(b, a), np.subtract(c, a))
+    return vec(n / np.linalg.norm(n))
+
+def draw_faces(mode, faces):
+    glBegin(mode)
+    for normal, vertices in faces:
+        glNormal3f(*normal)
+        for v in vertices:
+            glVertex3f(*v)
+    glEnd()
+
+def fender_arch_faces(arch_x_inner, thickness, cz, segments, inward_extra=0.0):
+    # semicírculo YZ; X pode recolher para dentro ao longo do arco
+    arch_x_outer = arch_x_inner + thickness
+
+    cy = 0.34
+    radius = 0.33
+
+    sides = {}
+    for sign in (+1, -1):
+        faces = []
+        for i in range(segments):
+            t1 = i / segments
+            t2 = (i+1) / segments
+
+            a1 = math.pi * t1
+            a2 = math.pi * t2
+
+            y1 = cy + radius * math.sin(a1)
+            z1 = cz + radius * math.cos(a1)
+
+            y2 = cy + radius * math.sin(a2)
+            z2 = cz + radius * math.cos(a2)
+
+            offset1 = t1 * inward_extra
+            offset2 = t2 * inward_extra
+
+            x_inner1 = (arch_x_inner - offset1) * sign
+            x_outer1 = (arch_x_outer - offset1) * sign
+
+            x_inner2 = (arch_x_inner - offset2) * sign
+            x_outer2 = (arch_x_outer - offset2) * sign
+
+            ny = math.sin((a1 + a2) * 0.5)
+            nz = math.cos((a1 + a2) * 0.5)
+
+            faces.append(((sign, ny * 0.4, nz * 0.4),
+                          ((x_inner1, y1, z1), (x_inner2, y2, z2),
+                           (x_outer2, y2, z2), (x_outer1, y1, z1))))
+        sides[sign] = faces
+    return sides[+1] + sides[-1]
+
+def build_body_geometry():
+    g = {}
+
+    # ---- guarda-lamas superior ----
+    chassis_top = 0.55
+    h_front = chassis_top + 0.07
+    h_rear = chassis_top + 0.27
+
+    z_front = 3.5 / 2.0
+    hood_length = 1.1
+    z_rear = z_front - hood_length
+
+    hood_half = 0.60
+
+    fender_front = hood_half + 0.10
+    fender_rear = hood_half + 0.20
+
+    L1 = (-hood_half, h_front, z_front)
+    L2 = (-hood_half, h_rear, z_rear)
+    L3 = (-fender_rear, h_rear - 0.05, z_rear)
+    L4 = (-fender_front, h_front - 0.05, z_front)
+
+    R1 = (hood_half, h_front, z_front)
+    R2 = (hood_half, h_rear, z_rear)
+    R3 = (fender_rear, h_rear - 0.05, z_rear)
+    R4 = (fender_front, h_front - 0.05, z_front)
+
+    g['fender_upper'] = [
+        (face_normal(L1, L2, L3), (L1, L2, L3, L4)),
+        (face_normal(R1, R4, R3), (R1, R4, R3, R2)),
+    ]
+
+    # ---- guarda-lamas médio e inferior ----
+    chassis_base = 0.25
+
+    fender_top_front = hood_half + 0.10
+    fender_top_rear = hood_half + 0.20
+
+    fender_mid_front = hood_half + 0.18
+    fender_mid_rear = hood_half + 0.27
+
+    fender_low_front = hood_half + 0.23
+    fender_low_rear = hood_half + 0.33
+
+    h_top_front = chassis_top + 0.07
+    h_top_rear = chassis_top + 0.27
+
+    h_mid_front = h_top_front - 0.15
+    h_mid_rear = h_top_rear - 0.18
+
+    h_low_front = chassis_base
+    h_low_rear = chassis_base
+
+    L1 = (-fender_top_front, h_top_front - 0.05, z_front)
+    L2 = (-fender_top_rear, h_top_rear - 0.05, z_rear)
+    L3 = (-fender_mid_rear, h_mid_rear, z_rear)
+    L4 = (-fender_mid_front, h_mid_front, z_front)
+
+    R1 = (fender_top_front, h_top_front - 0.05, z_front)
+    R2 = (fender_mid_front, h_mid_front, z_front)
+    R3 = (fender_mid_rear, h_mid_rear, z_rear)
+    R4 = (fender_top_rear, h_top_rear - 0.05, z_rear)
+
+    L5 = (-fender_mid_front, h_mid_front, z_front)
+    L6 = (-fender_mid_rear, h_mid_rear, z_rear)
+    L7 = (-fender_low_rear, h_low_rear, z_rear)
+    L8 = (-fender_low_front, h_low_front, z_front)
+
+    R5 = (fender_mid_front, h_mid_front, z_front)
+    R6 = (fender_low_front, h_low_front, z_front)
+    R7 = (fender_low_rear, h_low_rear, z_rear)
+    R8 = (fender_mid_rear, h_mid_rear, z_rear)
+
+    g['fender_middle'] = [
+        (face_normal(L1, L2, L3), (L1, L2, L3, L4)),
+        (face_normal(R1, R2, R3), (R1, R2, R3, R4)),
+    ]
+    g['fender_lower'] = [
+        (face_normal(L5, L6, L7), (L5, L6, L7, L8)),
+        (face_normal(R5, R6, R7), (R5, R6, R7, R8)),
+    ]
+
+    # ---- transição guarda-lamas / para-choques ----
+    top_bump = (0.60, 0.55, 1.95)
+    mid_bump = (0.60, 0.40, 1.95)
+    low_bump = (0.60, 0.25, 1.95)
+
+    top_fend = (0.70, 0.57, 1.75)
+    mid_fend = (0.78, 0.47, 1.75)
+    low_fend = (0.83, 0.25, 1.75)
+
+    n_right = face_normal(mid_bump, low_bump, low_fend)
+
+    tb, mb, lb = mirror_x(top_bump), mirror_x(mid_bump), mirror_x(low_bump)
+    tf, mf, lf = mirror_x(top_fend), mirror_x(mid_fend), mirror_x(low_fend)
+
+    n_left = tuple(-v for v in face_normal(mb, lb, lf))
+
+    g['fender_transition'] = [
+        (n_right, (top_bump, mid_bump, mid_fend, top_fend)),
+        (n_right, (mid_bump, low_bump, low_fend, mid_fend)),
+        (n_left, (tb, mb, mf, tf)),
+        (n_left, (mb, lb, lf, mf)),
+    ]
+
+    A = (-0.70, 0.55, 1.75)
+    B = (-0.60, 0.55, 1.95)
+    C = (-0.60, 0.62, 1.75)
+
+    Out = (
+        (A[0] + B[0] + C[0]) / 3 - 0.05,
+        (A[1] + B[1] + C[1]) / 3,
+        (A[2] + B[2] + C[2]) / 3 - 0.05
+    )
+
+    g['fender_transition_small'] = [
+        ((-0.25, 0.6, 0.75), (A, C, Out, B)),
+        ((0.25, 0.6, 0.75), (mirror_x(A), mirror_x(C), mirror_x(Out), mirror_x(B))),
+    ]
+
+    # ---- arcos das rodas ----
+    # um conjunto de faces por nível de detalhe
+    g['front_fender_arch'] = [fender_arch_faces(0.72, 0.13, 1.22, max(6, 32 >> level))
+                              for level in range(LOD_LEVELS)]
+    g['rear_fender_arch'] = [fender_arch_faces(0.84, 0.15, -1.25, max(6, 32 >> level), inward_extra=0.10)
+                             for level in range(LOD_LEVELS)]
+
+    # ---- guarda-lamas até ao para-brisas ----
+    F = (0.80, 0.77, 0.65) # fender exterior
+    A = (0.60, 0.82, 0.65) # fender interior
+    B = (0.63, 1.19, -0.05)# moldura do vidro
+
+    normal = face_normal(F, A, B)
+
+    g['fender_to_windshield'] = [
+        (normal, (F, A, B)),
+        (mirror_x(normal), (mirror_x(F), mirror_x(A), mirror_x(B))),
+    ]
+
+    # ---- interior ----
+    g['cabin_floor_fill'] = [
+        ((0.0, 1.0, 0.0), ((-0.93, 0.25, 0.65), (0.93, 0.25, 0.65),
+                           (0.80, 0.77, 0.65), (-0.80, 0.77, 0.65))),
+    ]
+    g['car_tablier'] = [
+        ((0.0, 1.0, 0.0), ((-0.80, 0.77, 0.65), (0.80, 0.77, 0.65),
+                           (0.60, 0.82, 0.65), (-0.60, 0.82, 0.65))),
+    ]
+
+    # ---- coluna da direção ----
+    P0 = np.array((0.45, 0.72, 0.65))  # origem da coluna
+    P1 = np.array((0.45, 0.72, 0.45))
+
+    V = P1 - P0
+    length = np.linalg.norm(V)
+    Vn = V / length
+
+    Z = np.array((0.0, 0.0, 1.0))
+    dot = max(-1.0, min(1.0, float(np.dot(Z, Vn))))
+    angle = math.degrees(math.acos(dot))
+    axis = np.cross(Z, Vn)
+    axis = axis / np.linalg.norm(axis) if np.linalg.norm(axis) > 1e-6 else np.array((1.0, 0.0, 0.0))
+
+    g['steering_column'] = (vec(P0), vec(P1), float(length), float(angle), vec(axis))
+
+    return g
+
+BODY_GEOMETRY = build_body_geometry()
+
+
+# painéis presos aos pontos de ligação da porta (CAR_RIG): fixos, calculados
+# uma vez em DOOR_PANEL_GEOMETRY, depois de CAR_RIG
+def build_door_panel_geometry():
+    rig = CAR_RIG
+    door_base_top = rig.door_base_top
+    door_base_bottom = rig.door_base_bottom
+    door_base_rear = rig.door_base_rear
+    door_rear_bottom = rig.door_rear_bottom
+    quarter_window_rear = rig.quarter_rear
+
+    g = {}
+
+    # ---- vidro da porta ----
+    g['door_glass'] = (door_base_top, rig.glass_top_front,
+                       rig.glass_top_rear, door_base_rear)
+
+    # ---- ligação painel lateral ----
+    A = (0.63, 1.19, -0.05)
+    B = (0.80, 0.77, 0.65)    # fender superior
+    C = door_base_top
+
+    normal = face_normal(A, B, C)
+
+    g['side_panel_connector'] = [
+        (normal, (A, C, B)),
+        (mirror_x(normal), (mirror_x(A), mirror_x(C), mirror_x(B))),
+    ]
+
+    # ---- painel lateral ----
+    A = (0.93, 0.25, 0.65)
+    E = (0.87, 0.64, 0.65)
+    B = (0.80, 0.77, 0.65)
+    C = door_base_top
+    D = door_base_bottom
+
+    A2, E2, B2, C2, D2 = (mirror_x(p) for p in (A, E, B, C, D))
+
+    g['side_panel_fill'] = [
+        (face_normal(A, E, B), (A, E, B, C)),
+        (face_normal(A, D, C), (A, D, C, A)),
+        (tuple(-v for v in face_normal(A2, E2, B2)), (A2, E2, B2, C2)),
+        (face_normal(A2, C2, D2), (A2, C2, D2, A2)),
+    ]
+
+    # ---- janela traseira ----
+    A = rig.glass_top_rear
+    B = door_base_rear
+    C = quarter_window_rear
+
+    g['quarter_window_glass'] = (face_normal(A, B, C), (A, B, C))
+
+    # ---- painel superior ----
+    A = door_base_rear
+    C = quarter_window_rear
+    A_L = mirror_x(A)
+    C_L = mirror_x(C)
+
+    g['upper_side_panel'] = (face_normal(A, C, A_L), (A, C, C_L, A_L))
+
+    # ---- transição superior traseira ----
+    rear_z = -1.50
+
+    T = (C[0], C[1] - 0.04, rear_z)    # direito traseiro
+    T_L = (-C[0], C[1] - 0.04, rear_z) # esquerdo traseiro
+
+    rear_panel = T
+
+    g['upper_rear_transition_panel'] = (face_normal(C, T, C_L), (C, T, T_L, C_L))
+
+    # ---- transição traseira ----
+    P = rear_panel
+    P_L = mirror_x(P)
+
+    Cc = (0.575, 0.55, -1.92)    # chassi traseiro direito
+    Cc_L = (-0.575, 0.55, -1.92) # chassi traseiro esquerdo
+
+    g['rear_transition_panel'] = (face_normal(P, Cc, P_L), (P, Cc, Cc_L, P_L))
+
+    # ---- preenchimento traseiro ----
+    P1 = (0.575, 0.55, -1.92)
+    P2 = rear_panel
+    P3 = (0.85, 0.55, -1.75)
+    P4 = C
+
+    normal1 = face_normal(P1, P2, P3)
+    normal2 = face_normal(P4, P3, P2)
+
+    g['fill_rear_gap'] = [
+        (normal1, (P1, P2, P3)),
+        (normal2, (P4, P3, P2)),
+        (mirror_x(normal1), (mirror_x(P1), mirror_x(P2), mirror_x(P3))),
+        (mirror_x(normal2), (mirror_x(P4), mirror_x(P3), mirror_x(P2))),
+    ]
+
+    # ---- painel lateral traseiro ----
+    A = door_rear_bottom
+    D = (door_base_rear[0], door_base_rear[1] - 0.15, door_base_rear[2])
+    E = door_base_rear
+    B = (0.85, 0.55, -1.75)
+    Cs = (0.85, 0.25, -1.75)
+
+    A2, D2, E2, B2, C2 = (mirror_x(p) for p in (A, D, E, B, Cs))
+
+    g['rear_side_panel'] = [
+        (face_normal(A, Cs, D), (A, Cs, D)),
+        (face_normal(D, Cs, B), (D, Cs, B)),
+        (face_normal(D, B, E), (D, B, E)),
+        (face_normal(A2, D2, C2), (A2, D2, C2)),
+        (face_normal(D2, B2, C2), (D2, B2, C2)),
+        (face_normal(D2, E2, B2), (D2, E2, B2)),
+    ]
+
+    # ---- ligação superior traseira / triângulo traseiro ----
+    # normais viradas para fora (+X à direita, -X à esquerda)
+    def outward(a, b, c, sign):
+        n = face_normal(a, b, c)
+        return tuple(-v for v in n) if n[0] * sign < 0 else n
+
+    P1 = door_base_rear
+    P2 = rear_panel
+    P3 = (0.85, 0.55, -1.75)
+    P1L, P2L, P3L = mirror_x(P1), mirror_x(P2), mirror_x(P3)
+
+    g['rear_upper_link'] = [
+        (outward(P1, P2, P3, 1), (P1, P2, P3)),
+        (outward(P1L, P2L, P3L, -1), (P1L, P2L, P3L)),
+    ]
+
+    A = rear_panel
+    B = door_base_rear
+    C = quarter_window_rear
+    A2, B2, C2 = mirror_x(A), mirror_x(B), mirror_x(C)
+
+    g['rear_triangle_piece'] = [
+        (outward(A, B, C, 1), (A, B, C)),
+        (outward(A2, B2, C2, -1), (A2, B2, C2)),
+    ]
+
+    # ---- painel interior traseiro ----
+    A = door_rear_bottom   # inferior dianteiro
+    B = door_base_rear     # superior dianteiro
+    A2 = mirror_x(A)       # inferior traseiro
+    B2 = mirror_x(B)       # superior traseiro
+
+    g['rear_inner_panel'] = [
+        (face_normal(A, B, B2), (A, B, B2, A2)),
+    ]
+
+    return g
 
-def load_texture_from_image(img, name):
-    data = img.tobytes('raw','RGB',0,-1)
-    texid = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, texid)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    gluBuild2DMipmaps(GL_TEXTURE_2D, GL_RGB, img.width, img.height, GL_RGB, GL_UNSIGNED_BYTE, data)
-    textures[name] = texid
-    return texid
 
 # ---------- Scene ----------
 def draw_ground():
+    if state.compiled_body:
+        draw_cached('ground')
+        return
+
     glEnable(GL_TEXTURE_2D)
     glBindTexture(GL_TEXTURE_2D, textures.get('ground', 0))
     set_material('wood')
@@ -126,6 +801,15 @@ def draw_ground():
 
 # ---------- Garage ----------
 def draw_garage():
+    if state.compiled_body:
+        draw_cached('garage_walls')
+    else:
+        draw_garage_walls()
+
+    draw_garage_door()
+
+
+def draw_garage_walls():
 
     cx = -1.7
     cz = 15.0
@@ -209,34 +893,49 @@ def draw_garage():
     glVertex3f(dr, y1, front)
     glEnd()
 
-    draw_garage_door()
 
+garage_matrix_cache = []
+state.subscribe(('garage_anim',), garage_matrix_cache.clear)
 
-def draw_garage_door():
+def garage_door_matrix():
+    if not garage_matrix_cache:
+        garage_matrix_cache.append(build_garage_door_matrix())
+    return garage_matrix_cache[0]
+
+def build_garage_door_matrix():
 
     cx = -1.7
     cz = 15.0
     depth = 8.0
 
-    door_w = 6.0
     door_h = 3.0
-    door_t = 0.15
 
     front = cz - depth/2  
 
     #angulo porta
-    angle = 100 if state['garage_open'] else 0
+    angle = GARAGE_OPEN_ANGLE * ease(state.garage_anim)
 
+    #angulo e direção abertura
+    return (translation_matrix(cx, 0, front)
+            @ translation_matrix(0, door_h, 0)
+            @ rotation_matrix(angle, 1, 0, 0)
+            @ translation_matrix(0, -door_h, 0))
+
+def draw_garage_door():
     glPushMatrix()
+    glMultMatrixf(garage_door_matrix().T)
 
-    glTranslatef(cx, 0, front)
+    if state.compiled_body:
+        draw_cached('garage_door')
+    else:
+        draw_garage_door_geometry()
 
-    
-    #angulo e direção abertura
-    glTranslatef(0, door_h, 0)
-    glRotatef(angle, 1, 0, 0)
+    glPopMatrix()
 
-    glTranslatef(0, -door_h, 0)
+def draw_garage_door_geometry():
+    door_w = 6.0
+    door_h = 3.0
+    door_t = 0.15
 
     set_material("metal")
 
@@ -246,9 +945,14 @@ def draw_garage_door():
     glutSolidCube(1.0)
     glPopMatrix()
 
-    glPopMatrix()
-
 def draw_tree(x, z):
+    if state.compiled_body:
+        glPushMatrix()
+        glTranslatef(x, 0, z)
+        draw_cached('tree')
+        glPopMatrix()
+        return
+
     set_material('wood')
     glPushMatrix()
     glTranslatef(x, 0, z)
@@ -261,10 +965,17 @@ def draw_tree(x, z):
     glPushMatrix()
     glTranslatef(x, 2.3, z)
     glScalef(1.5, 1.7, 1.5)
-    glutSolidSphere(0.7, 18, 14)
+    glutSolidSphere(0.7, lod(18), lod(14))
     glPopMatrix()
 
 def draw_lamp_post(x,z):
+    if state.compiled_body:
+        glPushMatrix()
+        glTranslatef(x, 0, z)
+        draw_cached('lamp_post')
+        glPopMatrix()
+        return
+
     set_material('metal')
     glPushMatrix()
     glTranslatef(x,0,z)
@@ -276,9 +987,24 @@ def draw_lamp_post(x,z):
     set_material('glass')
     glPushMatrix()
     glTranslatef(x,3.0,z)
-    glutSolidSphere(0.18,16,12)
+    glutSolidSphere(0.18,lod(16),lod(12))
     glPopMatrix()
 
+# cenário por omissão (sem --scene): (tipo, x, z)
+SCENE_PROPS = [
+    ('tree', -8, 8),
+    ('tree', 6, -6),
+    ('tree', 6, 10),
+    ('tree', -8, -6),
+    ('lamp_post', -9, 2),
+    ('lamp_post', 8, 3),
+]
+
+PROP_DRAW = {
+    'tree': draw_tree,
+    'lamp_post': draw_lamp_post,
+}
+
 def draw_chassis():
     glPushMatrix()
     set_material('car_red')
@@ -597,296 +1323,68 @@ def draw_front_bumper():
 def draw_fender_upper():
     glPushMatrix()
     set_material('fender_metal')
+    draw_faces(GL_QUADS, BODY_GEOMETRY['fender_upper'])
+    glPopMatrix()
 
-    import numpy as np
-
-    def N(a, b, c):
-        v1 = b - a
-        v2 = c - a
-        n = np.cross(v1, v2)
-        return n / np.linalg.norm(n)
+def draw_fender_middle_and_lower():
+    glPushMatrix()
+    set_material('fender_metal')
 
-    chassis_top = 0.55
-    h_front = chassis_top + 0.07
-    h_rear = chassis_top + 0.27
+    # =============================
+    # CAMADA MÉDIA
+    # =============================
+    draw_faces(GL_QUADS, BODY_GEOMETRY['fender_middle'])
 
-    z_front = 3.5 / 2.0
-    hood_length = 1.1
-    z_rear = z_front - hood_length
+    # =============================
+    # CAMADA INFERIOR
+    # =============================
+    draw_faces(GL_QUADS, BODY_GEOMETRY['fender_lower'])
 
-    hood_half = 0.60
+    glPopMatrix()
 
-    fender_front = hood_half + 0.10
-    fender_rear = hood_half + 0.20
+def draw_fender_transition():
+    glPushMatrix()
+    set_material('car_red')
+    draw_faces(GL_QUADS, BODY_GEOMETRY['fender_transition'])
+    glPopMatrix()
 
-    L1 = np.array((-hood_half, h_front, z_front))
-    L2 = np.array((-hood_half, h_rear, z_rear))
-    L3 = np.array((-fender_rear, h_rear - 0.05, z_rear))
-    L4 = np.array((-fender_front, h_front - 0.05, z_front))
 
-    normal_left = N(L1, L2, L3)
+def draw_fender_transition_small():
+    glPushMatrix()
+    set_material('car_red')
+    draw_faces(GL_QUADS, BODY_GEOMETRY['fender_transition_small'])
+    glPopMatrix()
 
-    
-    R1 = np.array((hood_half, h_front, z_front))
-    R2 = np.array((hood_half, h_rear, z_rear))
-    R3 = np.array((fender_rear, h_rear - 0.05, z_rear))
-    R4 = np.array((fender_front, h_front - 0.05, z_front))
+def draw_raw_wheel(radius, width):
+    if state.compiled_body:
+        name = wheel_mesh_name(radius, width)
+        CACHED_MESHES.setdefault(name, (draw_raw_wheel_geometry, radius, width))
+        draw_cached(name)
+        return
 
-    normal_right = N(R1, R4, R3)
+    draw_raw_wheel_geometry(radius, width)
 
-    glBegin(GL_QUADS)
-    glNormal3f(*normal_left)
-    glVertex3f(*L1)
-    glVertex3f(*L2)
-    glVertex3f(*L3)
-    glVertex3f(*L4)
-
-    glNormal3f(*normal_right)
-    glVertex3f(*R1)
-    glVertex3f(*R4)
-    glVertex3f(*R3)
-    glVertex3f(*R2)
+def draw_raw_wheel_geometry(radius, width):
+    set_material("rubber")
+    glPushMatrix()
+    gluCylinder(quadric, radius, radius, width, lod(26), 1)
+    gluDisk(quadric, 0, radius, lod(26), 1)
 
-    glEnd()
+    glTranslatef(0, 0, width)
+    gluDisk(quadric, 0, radius, lod(26), 1)
     glPopMatrix()
 
-def draw_fender_middle_and_lower():
+    # jante
+    set_material("rim")
     glPushMatrix()
-    set_material('fender_metal')
-
-    import numpy as np
-
-    def N(a, b, c):
-        v1 = np.subtract(b, a)
-        v2 = np.subtract(c, a)
-        n = np.cross(v1, v2)
-        return n / np.linalg.norm(n)
-
-    chassis_top = 0.55
-    chassis_base = 0.25
+    glTranslatef(0, 0, width + 0.003)
 
-    z_front = 1.75
-    hood_length = 1.1
-    z_rear = z_front - hood_length 
+    rim_outer = radius * 0.80
+    rim_inner = radius * 0.55
+    center_r  = radius * 0.30
 
-    hood_half = 0.60
-
-    fender_top_front = hood_half + 0.10
-    fender_top_rear = hood_half + 0.20
-
-    fender_mid_front = hood_half + 0.18
-    fender_mid_rear = hood_half + 0.27
-
-    fender_low_front = hood_half + 0.23
-    fender_low_rear = hood_half + 0.33
-
-    h_top_front = chassis_top + 0.07
-    h_top_rear = chassis_top + 0.27
-
-    h_mid_front = h_top_front - 0.15
-    h_mid_rear = h_top_rear - 0.18
-
-    h_low_front = chassis_base
-    h_low_rear = chassis_base
-
-    # =============================
-    # CAMADA MÉDIA
-    # =============================
-
-    L1 = np.array((-fender_top_front, h_top_front - 0.05, z_front))
-    L2 = np.array((-fender_top_rear, h_top_rear - 0.05, z_rear))
-    L3 = np.array((-fender_mid_rear, h_mid_rear, z_rear))
-    L4 = np.array((-fender_mid_front, h_mid_front, z_front))
-
-    normal_mid_left = N(L1, L2, L3)
-
-    glBegin(GL_QUADS)
-    glNormal3f(*normal_mid_left)
-    glVertex3f(*L1)
-    glVertex3f(*L2)
-    glVertex3f(*L3)
-    glVertex3f(*L4)
-
-    R1 = np.array((fender_top_front, h_top_front - 0.05, z_front))
-    R2 = np.array((fender_mid_front, h_mid_front, z_front))
-    R3 = np.array((fender_mid_rear, h_mid_rear, z_rear))
-    R4 = np.array((fender_top_rear, h_top_rear - 0.05, z_rear))
-
-    normal_mid_right = N(R1, R2, R3)
-
-    glNormal3f(*normal_mid_right)
-    glVertex3f(*R1)
-    glVertex3f(*R2)
-    glVertex3f(*R3)
-    glVertex3f(*R4)
-    glEnd()
-
-    # =============================
-    # CAMADA INFERIOR
-    # =============================
-
-    L5 = np.array((-fender_mid_front, h_mid_front, z_front))
-    L6 = np.array((-fender_mid_rear, h_mid_rear, z_rear))
-    L7 = np.array((-fender_low_rear, h_low_rear, z_rear))
-    L8 = np.array((-fender_low_front, h_low_front, z_front))
-
-    normal_low_left = N(L5, L6, L7)
-
-    glBegin(GL_QUADS)
-    glNormal3f(*normal_low_left)
-    glVertex3f(*L5)
-    glVertex3f(*L6)
-    glVertex3f(*L7)
-    glVertex3f(*L8)
-
-    R5 = np.array((fender_mid_front, h_mid_front, z_front))
-    R6 = np.array((fender_low_front, h_low_front, z_front))
-    R7 = np.array((fender_low_rear, h_low_rear, z_rear))
-    R8 = np.array((fender_mid_rear, h_mid_rear, z_rear))
-
-    normal_low_right = N(R5, R6, R7)
-
-    glNormal3f(*normal_low_right)
-    glVertex3f(*R5)
-    glVertex3f(*R6)
-    glVertex3f(*R7)
-    glVertex3f(*R8)
-    glEnd()
-
-    glPopMatrix()
-
-def draw_fender_transition():
-    glPushMatrix()
-    set_material('car_red')
-
-    import numpy as np
-
-    def N(a, b, c):
-        v1 = np.subtract(b, a)
-        v2 = np.subtract(c, a)
-        n = np.cross(v1, v2)
-        n = n / np.linalg.norm(n)
-        return n
-
-    top_bump = np.array((0.60, 0.55, 1.95))
-    mid_bump = np.array((0.60, 0.40, 1.95))
-    low_bump = np.array((0.60, 0.25, 1.95))
-
-    top_fend = np.array((0.70, 0.57, 1.75))
-    mid_fend = np.array((0.78, 0.47, 1.75))
-    low_fend = np.array((0.83, 0.25, 1.75))
-
-    # direita
-    n_right = N(mid_bump, low_bump, low_fend)
-
-    # TOP right
-    glBegin(GL_QUADS)
-    glNormal3f(*n_right)
-    glVertex3f(*top_bump)
-    glVertex3f(*mid_bump)
-    glVertex3f(*mid_fend)
-    glVertex3f(*top_fend)
-    glEnd()
-
-    # mid right
-    glBegin(GL_QUADS)
-    glNormal3f(*n_right)
-    glVertex3f(*mid_bump)
-    glVertex3f(*low_bump)
-    glVertex3f(*low_fend)
-    glVertex3f(*mid_fend)
-    glEnd()
-
-    # esquerda
-    def mirror(v):
-        return np.array((-v[0], v[1], v[2]))
-
-    tb = mirror(top_bump)
-    mb = mirror(mid_bump)
-    lb = mirror(low_bump)
-    tf = mirror(top_fend)
-    mf = mirror(mid_fend)
-    lf = mirror(low_fend)
-
-    n_left = -N(mb, lb, lf)
-
-    # top left
-    glBegin(GL_QUADS)
-    glNormal3f(*n_left)
-    glVertex3f(*tb)
-    glVertex3f(*mb)
-    glVertex3f(*mf)
-    glVertex3f(*tf)
-    glEnd()
-
-    # lower left
-    glBegin(GL_QUADS)
-    glNormal3f(*n_left)
-    glVertex3f(*mb)
-    glVertex3f(*lb)
-    glVertex3f(*lf)
-    glVertex3f(*mf)
-    glEnd()
-
-    glPopMatrix()
-
-
-def draw_fender_transition_small():
-    glPushMatrix()
-    set_material('car_red')
-
-    A = (-0.70, 0.55, 1.75)
-    B = (-0.60, 0.55, 1.95)
-    C = (-0.60, 0.62, 1.75)
-
-    Out = (
-        (A[0] + B[0] + C[0]) / 3 - 0.05,
-        (A[1] + B[1] + C[1]) / 3,
-        (A[2] + B[2] + C[2]) / 3 - 0.05
-    )
-
-    glBegin(GL_QUADS)
-    glNormal3f(-0.25, 0.6, 0.75)
-    glVertex3f(*A)
-    glVertex3f(*C)
-    glVertex3f(*Out)
-    glVertex3f(*B)
-    glEnd()
-
-    def M(p):
-        return (-p[0], p[1], p[2])
-
-    glBegin(GL_QUADS)
-    glNormal3f(0.25, 0.6, 0.75)
-    glVertex3f(*M(A))
-    glVertex3f(*M(C))
-    glVertex3f(*M(Out))
-    glVertex3f(*M(B))
-    glEnd()
-
-    glPopMatrix()
-
-def draw_raw_wheel(radius, width):
-    set_material("rubber")
-    glPushMatrix()
-    gluCylinder(quadric, radius, radius, width, 26, 1)
-    gluDisk(quadric, 0, radius, 26, 1)
-
-    glTranslatef(0, 0, width)
-    gluDisk(quadric, 0, radius, 26, 1)
-    glPopMatrix()
-
-    # jante
-    set_material("rim")
-    glPushMatrix()
-    glTranslatef(0, 0, width + 0.003)
-
-    rim_outer = radius * 0.80
-    rim_inner = radius * 0.55
-    center_r  = radius * 0.30
-
-    gluDisk(quadric, rim_inner, rim_outer, 32, 1)
-    gluDisk(quadric, 0, center_r, 20, 1)
+    gluDisk(quadric, rim_inner, rim_outer, lod(32), 1)
+    gluDisk(quadric, 0, center_r, lod(20), 1)
 
     # Raios
     glBegin(GL_QUADS)
@@ -908,139 +1406,91 @@ def draw_raw_wheel(radius, width):
     glEnd()
     glPopMatrix()
 
-def place_wheel(x, y, z, radius, width, is_left, is_front):
-    glPushMatrix()
-    glTranslatef(x, y, z)
-
-    # -------------------------
-    # ACKERMANN STEERING
-    # -------------------------
-    if is_front:
-        base_angle = state['steer_angle']
-
-        if base_angle > 0:  # virar esquerda
-            steer = base_angle * (1.20 if is_left else 0.80)
-        elif base_angle < 0:  # virar direita
-            steer = base_angle * (0.80 if is_left else 1.20)
-        else:
-            steer = 0
-
-        glRotatef(-steer, 0, 1, 0)
-
-    if is_left:
-        glRotatef(-90, 0, 1, 0)
-    else:
-        glRotatef(90, 0, 1, 0)
-   
-
-    direction_correction = -1 if is_left else 1
-    spin_factor = 0.24 / radius
-   
-
-    spin_angle = direction_correction * (-state['wheel_spin'] * spin_factor)
-
-    glRotatef(spin_angle, 0, 0, 1)
-
-    draw_raw_wheel(radius, width)
-    glPopMatrix()
-
-
-def place_wheel_rear(x, y, z, radius, width, is_left, is_front):
-    glPushMatrix()
-    glTranslatef(x, y, z)
-
-    # -------------------------
-    # ACKERMANN STEERING
-    # -------------------------
-    if is_front:
-        base_angle = state['steer_angle']
-
-        if base_angle > 0:  # virar esquerda
-            steer = base_angle * (1.20 if is_left else 0.80)
-        elif base_angle < 0:  # virar direita
-            steer = base_angle * (0.80 if is_left else 1.20)
-        else:
-            steer = 0
-
-        glRotatef(-steer, 0, 1, 0)
-
-    if is_left:
-        glRotatef(-90, 0, 1, 0)
-    else:
-        glRotatef(90, 0, 1, 0)
-   
-
-    direction_correction = -1 if is_left else 1
-    
-    spin_factor_rear = 0.24 / radius 
-
-    spin_angle = direction_correction * (-state['wheel_spin'] * spin_factor_rear)
+def wheel_placements():
+    # (x, y, z, raio, largura, esquerda, frente)
+    radius_front = 0.22
+    width_front  = 0.18
+    wheel_y_front = 0.35 - radius_front + 0.25
 
-    glRotatef(spin_angle, 0, 0, 1)
+    radius_rear = 0.24
+    width_rear  = 0.20
+    wheel_y_rear = wheel_y_front + (radius_front - radius_rear)
 
-    draw_raw_wheel(radius, width)
-    glPopMatrix()
+    return [
+        (-0.78, wheel_y_front,  1.25, radius_front, width_front, True,  True),   # frente esquerda
+        (+0.78, wheel_y_front,  1.25, radius_front, width_front, False, True),   # frente direita
+        (-0.77, wheel_y_rear,  -1.25, radius_rear,  width_rear,  True,  False),  # trás esquerda
+        (+0.77, wheel_y_rear,  -1.25, radius_rear,  width_rear,  False, False),  # trás direita
+    ]
 
+CAR_WHEELS = wheel_placements()
+WHEEL_POSITIONS = np.array([w[0:3] for w in CAR_WHEELS])
+WHEEL_RADII = np.array([w[3] for w in CAR_WHEELS])
+WHEEL_IS_LEFT = np.array([w[5] for w in CAR_WHEELS])
+WHEEL_IS_FRONT = np.array([w[6] for w in CAR_WHEELS])
+
+# caches de matrizes: esvaziadas pelo estado quando os campos de que dependem mudam
+wheel_transforms_cache = []
+state.subscribe(('steer_angle', 'wheel_spin'), wheel_transforms_cache.clear)
+
+def wheel_transforms():
+    # matrizes das 4 rodas num só cálculo: Ackermann, lado e rotação
+    if wheel_transforms_cache:
+        return wheel_transforms_cache[0]
+
+    base_angle, wheel_spin = state.steer_angle, state.wheel_spin
+
+    # ACKERMANN STEERING: roda interior vira mais
+    if base_angle > 0:  # virar esquerda
+        factor = np.where(WHEEL_IS_LEFT, 1.20, 0.80)
+    else:               # virar direita
+        factor = np.where(WHEEL_IS_LEFT, 0.80, 1.20)
+    steer = np.where(WHEEL_IS_FRONT, base_angle * factor, 0.0)
+
+    side = np.where(WHEEL_IS_LEFT, -90.0, 90.0)
+    direction_correction = np.where(WHEEL_IS_LEFT, -1.0, 1.0)
+    spin = direction_correction * (-wheel_spin * 0.24 / WHEEL_RADII)
+
+    # T(posição) . Ry(lado - viragem) . Rz(rotação)
+    yaw = np.radians(side - steer)
+    roll = np.radians(spin)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cr, sr = np.cos(roll), np.sin(roll)
+
+    m = np.zeros((len(CAR_WHEELS), 4, 4))
+    m[:, 0, 0] = cy * cr
+    m[:, 0, 1] = -cy * sr
+    m[:, 0, 2] = sy
+    m[:, 1, 0] = sr
+    m[:, 1, 1] = cr
+    m[:, 2, 0] = -sy * cr
+    m[:, 2, 1] = sy * sr
+    m[:, 2, 2] = cy
+    m[:, 0:3, 3] = WHEEL_POSITIONS
+    m[:, 3, 3] = 1.0
+
+    wheel_transforms_cache.append(m)
+    return m
+
+def draw_wheels(front):
+    matrices = wheel_transforms()
+    for i, (_, _, _, radius, width, _, is_front) in enumerate(CAR_WHEELS):
+        if is_front != front:
+            continue
+        glPushMatrix()
+        glMultMatrixf(matrices[i].T)
+        draw_raw_wheel(radius, width)
+        glPopMatrix()
 
 def draw_front_wheels():
-    radius = 0.22
-    width  = 0.18
-
-    wheel_y = 0.35 - radius + 0.25  
-    wheel_x = 0.78 
-    wheel_z = 1.25
-
- 
-    place_wheel(-wheel_x, wheel_y, wheel_z, radius, width, True,  True) # frente esquerda
-    place_wheel(+wheel_x, wheel_y, wheel_z, radius, width, False, True) # frente direita
+    draw_wheels(True)
 
 
 
    
 def draw_front_fender_arch():
     set_material('car_red')
-
-    arch_x_inner = 0.72
-    thickness    = 0.13
-    arch_x_outer = arch_x_inner + thickness
-
-    cy = 0.34
-    cz = 1.22
-    radius = 0.33
-    segments = 32  
-
-    def draw_side(sign):
-        x_inner =  arch_x_inner * sign
-        x_outer =  arch_x_outer * sign
-        normal_x = 1.0 * sign 
-
-        glBegin(GL_QUADS)
-        for i in range(segments):
-            a1 = math.pi * (i / segments)
-            a2 = math.pi * ((i+1) / segments)
-
-            y1 = cy + radius * math.sin(a1)
-            z1 = cz + radius * math.cos(a1)
-
-            y2 = cy + radius * math.sin(a2)
-            z2 = cz + radius * math.cos(a2)
-
-            ny = math.sin((a1 + a2) * 0.5)
-            nz = math.cos((a1 + a2) * 0.5)
-
-            glNormal3f(normal_x, ny * 0.4, nz * 0.4)
-
-            glVertex3f(x_inner, y1, z1)
-            glVertex3f(x_inner, y2, z2)
-            glVertex3f(x_outer, y2, z2)
-            glVertex3f(x_outer, y1, z1)
-
-        glEnd()
-
-    # direito
-    draw_side(+1)
-    # esquerdo
-    draw_side(-1)
+    draw_faces(GL_QUADS, BODY_GEOMETRY['front_fender_arch'][lod_level])
 
 def draw_windshield_frame():
     glPushMatrix()
@@ -1125,161 +1575,193 @@ def chassis_x_at_z(z):
     t = (z - z_mid) / (z_rear - z_mid)
     return mw + t * (rw - mw)
 
-def draw_doors():
-    global door_base_top, door_base_bottom, door_base_rear, door_rear_bottom
+def door_points(side):
+    door_front_z = 0.55
+    door_back_z = -0.80
+    y_bottom = 0.25
+    y_top = 0.82
+
+    base_inner_front = chassis_x_at_z(door_front_z)
+    base_inner_back = chassis_x_at_z(door_back_z)
+
+    thickness = 0.06
+
+    sign = -1 if side == "left" else 1
+
+    x_inner_front = sign * base_inner_front
+    x_inner_back = sign * base_inner_back
+    x_outer_front = sign * (base_inner_front + thickness)
+    x_outer_back = sign * (base_inner_back + thickness)
+
+    return (x_inner_front, x_inner_back, x_outer_front, x_outer_back,
+            y_bottom, y_top, door_front_z, door_back_z)
+
+# pontos de ligação da porta direita (os painéis do lado esquerdo são espelhados)
+CarRig = namedtuple('CarRig', [
+    'door_base_top', 'door_base_bottom', 'door_base_rear', 'door_rear_bottom',
+    'glass_top_front', 'glass_top_rear', 'quarter_rear',
+])
+
+def build_car_rig():
+    (_, _, x_outer_front, x_outer_back,
+     y_bottom, y_top, door_front_z, door_back_z) = door_points("right")
+
+    door_base_top = (x_outer_front, y_top, door_front_z)
+    door_base_rear = (x_outer_back, y_top, door_back_z)
+
+    # topo do vidro: parte do topo do para-brisas e recua com a porta
+    glass_top_front = (0.63, 1.19, -0.05)
+    recuo_x = door_base_top[0] - glass_top_front[0]
+    glass_top_rear = (door_base_rear[0] - recuo_x, 1.19, door_base_rear[2])
+
+    return CarRig(
+        door_base_top=door_base_top,
+        door_base_bottom=(x_outer_front, y_bottom, door_front_z),
+        door_base_rear=door_base_rear,
+        door_rear_bottom=(x_outer_back, y_bottom, door_back_z),
+        glass_top_front=glass_top_front,
+        glass_top_rear=glass_top_rear,
+        quarter_rear=(door_base_rear[0] - 0.07, door_base_rear[1] + 0.07, -1.30),
+    )
 
-    for side in ("left", "right"):
+# os pontos não dependem da abertura: a porta roda à volta deles
+CAR_RIG = build_car_rig()
+DOOR_PANEL_GEOMETRY = build_door_panel_geometry()
 
-        glPushMatrix()
-        set_material('car_red')
+# cada porta só invalida a sua matriz
+door_matrix_cache = {}
+state.subscribe(('left_door_anim',), functools.partial(door_matrix_cache.pop, 'left', None))
+state.subscribe(('right_door_anim',), functools.partial(door_matrix_cache.pop, 'right', None))
 
-        door_front_z = 0.55
-        door_back_z = -0.80
-        y_bottom = 0.25
-        y_top = 0.82
+def door_matrix(side):
+    if side in door_matrix_cache:
+        return door_matrix_cache[side]
 
-        base_inner_front = chassis_x_at_z(door_front_z)
-        base_inner_back = chassis_x_at_z(door_back_z)
+    _, _, x_outer_front, _, y_bottom, _, door_front_z, _ = door_points(side)
 
-        thickness = 0.06
+    pivot_x = x_outer_front
+    pivot_y = y_bottom
+    pivot_z = door_front_z
 
-        sign = -1 if side == "left" else 1
+    if side == "left":
+        angle = DOOR_OPEN_ANGLE * ease(state.left_door_anim)
+    else:
+        angle = -DOOR_OPEN_ANGLE * ease(state.right_door_anim)
 
-        x_inner_front = sign * base_inner_front
-        x_inner_back = sign * base_inner_back
-        x_outer_front = sign * (base_inner_front + thickness)
-        x_outer_back = sign * (base_inner_back + thickness)
+    door_matrix_cache[side] = m = (translation_matrix(pivot_x, pivot_y, pivot_z)
+                                   @ rotation_matrix(angle, 0, 1, 0)
+                                   @ translation_matrix(-pivot_x, -pivot_y, -pivot_z))
+    return m
 
-        pivot_x = x_outer_front
-        pivot_y = y_bottom
-        pivot_z = door_front_z
+def apply_door_transform(side):
+    glMultMatrixf(door_matrix(side).T)
 
-        if side == "left":
-            angle = 70.0 if state['left_door_open'] else 0.0
-        else:
-            angle = -70.0 if state['right_door_open'] else 0.0
+def draw_door_leaf(side):
+    set_material('car_red')
 
-        glTranslatef(pivot_x, pivot_y, pivot_z)
-        glRotatef(angle, 0, 1, 0)
-        glTranslatef(-pivot_x, -pivot_y, -pivot_z)
+    (x_inner_front, x_inner_back, x_outer_front, x_outer_back,
+     y_bottom, y_top, door_front_z, door_back_z) = door_points(side)
 
-        door_base_top = (x_outer_front, y_top, door_front_z)
-        door_base_bottom = (x_outer_front, y_bottom, door_front_z)
-        door_base_rear = (x_outer_back, y_top, door_back_z)
-        door_rear_bottom = (x_outer_back, y_bottom, door_back_z)
+    glBegin(GL_QUADS)
+    normal_x = 1 if side == "right" else -1
+    glNormal3f(normal_x, 0, 0)
+    glVertex3f(x_outer_front, y_bottom, door_front_z)
+    glVertex3f(x_outer_front, y_top, door_front_z)
+    glVertex3f(x_outer_back, y_top, door_back_z)
+    glVertex3f(x_outer_back, y_bottom, door_back_z)
+    glEnd()
 
-        glBegin(GL_QUADS)
-        normal_x = 1 if side == "right" else -1
-        glNormal3f(normal_x, 0, 0)
-        glVertex3f(x_outer_front, y_bottom, door_front_z)
-        glVertex3f(x_outer_front, y_top, door_front_z)
-        glVertex3f(x_outer_back, y_top, door_back_z)
-        glVertex3f(x_outer_back, y_bottom, door_back_z)
-        glEnd()
+    glBegin(GL_QUADS)
+    glNormal3f(-normal_x, 0, 0)
+    glVertex3f(x_inner_front, y_bottom, door_front_z)
+    glVertex3f(x_inner_front, y_top, door_front_z)
+    glVertex3f(x_inner_back, y_top, door_back_z)
+    glVertex3f(x_inner_back, y_bottom, door_back_z)
+    glEnd()
 
-        glBegin(GL_QUADS)
-        glNormal3f(-normal_x, 0, 0)
-        glVertex3f(x_inner_front, y_bottom, door_front_z)
-        glVertex3f(x_inner_front, y_top, door_front_z)
-        glVertex3f(x_inner_back, y_top, door_back_z)
-        glVertex3f(x_inner_back, y_bottom, door_back_z)
-        glEnd()
+    glBegin(GL_QUADS)
+    glNormal3f(0, 1, 0)
+    glVertex3f(x_inner_front, y_top, door_front_z)
+    glVertex3f(x_outer_front, y_top, door_front_z)
+    glVertex3f(x_outer_back, y_top, door_back_z)
+    glVertex3f(x_inner_back, y_top, door_back_z)
+    glEnd()
 
-        glBegin(GL_QUADS)
-        glNormal3f(0, 1, 0)
-        glVertex3f(x_inner_front, y_top, door_front_z)
-        glVertex3f(x_outer_front, y_top, door_front_z)
-        glVertex3f(x_outer_back, y_top, door_back_z)
-        glVertex3f(x_inner_back, y_top, door_back_z)
-        glEnd()
+    glBegin(GL_QUADS)
+    glNormal3f(0, -1, 0)
+    glVertex3f(x_inner_front, y_bottom, door_front_z)
+    glVertex3f(x_outer_front, y_bottom, door_front_z)
+    glVertex3f(x_outer_back, y_bottom, door_back_z)
+    glVertex3f(x_inner_back, y_bottom, door_back_z)
+    glEnd()
 
-        glBegin(GL_QUADS)
-        glNormal3f(0, -1, 0)
-        glVertex3f(x_inner_front, y_bottom, door_front_z)
-        glVertex3f(x_outer_front, y_bottom, door_front_z)
-        glVertex3f(x_outer_back, y_bottom, door_back_z)
-        glVertex3f(x_inner_back, y_bottom, door_back_z)
-        glEnd()
+    glBegin(GL_QUADS)
+    glNormal3f(0, 0, 1)
+    glVertex3f(x_inner_front, y_bottom, door_front_z)
+    glVertex3f(x_outer_front, y_bottom, door_front_z)
+    glVertex3f(x_outer_front, y_top, door_front_z)
+    glVertex3f(x_inner_front, y_top, door_front_z)
+    glEnd()
 
-        glBegin(GL_QUADS)
-        glNormal3f(0, 0, 1)
-        glVertex3f(x_inner_front, y_bottom, door_front_z)
-        glVertex3f(x_outer_front, y_bottom, door_front_z)
-        glVertex3f(x_outer_front, y_top, door_front_z)
-        glVertex3f(x_inner_front, y_top, door_front_z)
-        glEnd()
+    glBegin(GL_QUADS)
+    glNormal3f(0, 0, -1)
+    glVertex3f(x_inner_back, y_bottom, door_back_z)
+    glVertex3f(x_outer_back, y_bottom, door_back_z)
+    glVertex3f(x_outer_back, y_top, door_back_z)
+    glVertex3f(x_inner_back, y_top, door_back_z)
+    glEnd()
 
-        glBegin(GL_QUADS)
-        glNormal3f(0, 0, -1)
-        glVertex3f(x_inner_back, y_bottom, door_back_z)
-        glVertex3f(x_outer_back, y_bottom, door_back_z)
-        glVertex3f(x_outer_back, y_top, door_back_z)
-        glVertex3f(x_inner_back, y_top, door_back_z)
-        glEnd()
+    set_material("metal")
 
-        set_material("metal")
+    handle_y = (y_bottom + y_top) / 2 + 0.05
+    handle_z = door_front_z + 0.55 * (door_back_z - door_front_z)
 
-        handle_y = (y_bottom + y_top) / 2 + 0.05
-        handle_z = door_front_z + 0.55 * (door_back_z - door_front_z)
+    arm_x = x_outer_front + (0.002 if normal_x > 0 else -0.002)
 
-        arm_x = x_outer_front + (0.002 if normal_x > 0 else -0.002)
+    arm_w = 0.015
+    arm_h = 0.02
+    arm_d = 0.045
+    spacing = 0.10
+    peg_d = 0.045
+    peg_h = arm_h
+    peg_w = spacing + arm_w * 2
 
-        arm_w = 0.015
-        arm_h = 0.02
-        arm_d = 0.045
-        spacing = 0.10
-        peg_d = 0.045
-        peg_h = arm_h
-        peg_w = spacing + arm_w * 2
+    glPushMatrix()
+    glTranslatef(arm_x, handle_y, handle_z + spacing/2)
+    glScalef(arm_d, arm_h, arm_w)
+    glutSolidCube(1)
+    glPopMatrix()
 
-        glPushMatrix()
-        glTranslatef(arm_x, handle_y, handle_z + spacing/2)
-        glScalef(arm_d, arm_h, arm_w)
-        glutSolidCube(1)
-        glPopMatrix()
+    glPushMatrix()
+    glTranslatef(arm_x, handle_y, handle_z - spacing/2)
+    glScalef(arm_d, arm_h, arm_w)
+    glutSolidCube(1)
+    glPopMatrix()
 
-        glPushMatrix()
-        glTranslatef(arm_x, handle_y, handle_z - spacing/2)
-        glScalef(arm_d, arm_h, arm_w)
-        glutSolidCube(1)
-        glPopMatrix()
+    glPushMatrix()
+    glTranslatef(arm_x + (arm_d if normal_x > 0 else -arm_d), handle_y, handle_z)
+    glScalef(peg_d, peg_h, peg_w)
+    glutSolidCube(1)
+    glPopMatrix()
 
+def draw_doors():
+    for side in ("left", "right"):
         glPushMatrix()
-        glTranslatef(arm_x + (arm_d if normal_x > 0 else -arm_d), handle_y, handle_z)
-        glScalef(peg_d, peg_h, peg_w)
-        glutSolidCube(1)
-        glPopMatrix()
-
-        glPopMatrix()
-
-
-def compute_door_glass_points():
-    global door_base_top, door_base_bottom, door_base_rear
-    global door_glass_top_front, door_glass_top_rear
+        apply_door_transform(side)
 
-    # Usa a mesma lógica original
-    front_windshield_top = (0.63, 1.19, -0.05)
-
-    # ponto frontal do vidro
-    topA = front_windshield_top
-
-    # recuo calculado pela porta
-    recuo_x = door_base_top[0] - topA[0]
+        if state.compiled_body:
+            draw_cached('door_' + side)
+        else:
+            draw_door_leaf(side)
 
-    # ponto traseiro
-    topB = (door_base_rear[0] - recuo_x, 1.19, door_base_rear[2])
+        glPopMatrix()
 
-    door_glass_top_front = topA
-    door_glass_top_rear  = topB
 
 def draw_door_glass():
     # vidro da porta (direita e esquerda via mirroring)
     set_material("glass")
 
-    baseA = door_base_top          
-    baseB = door_base_rear        
-    topA  = door_glass_top_front 
-    topB  = door_glass_top_rear   
+    baseA, topA, topB, baseB = DOOR_PANEL_GEOMETRY['door_glass']
 
     for mirror in (1, -1):
         glPushMatrix()
@@ -1296,180 +1778,22 @@ def draw_door_glass():
 
 def draw_fender_to_windshield():
     set_material("car_red") 
-    import numpy as np
-
-    F = np.array((0.80, 0.77, 0.65))# fender exterior
-    A = np.array((0.60, 0.82, 0.65))# fender interior
-    B = np.array((0.63, 1.19, -0.05))# moldura do vidro 
-
-    AB = A - F   
-    AC = B - F  
-    normal = np.cross(AB, AC)
-    normal = normal / np.linalg.norm(normal)
-
-    # -------------------------
-    # LADO DIREITO
-    # -------------------------
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*normal)
-    glVertex3f(*F)
-    glVertex3f(*A)
-    glVertex3f(*B)
-    glEnd()
-
-    # -------------------------
-    # LADO ESQUERDO
-    # -------------------------
-
-    def M(p): 
-        return np.array((-p[0], p[1], p[2]))
-
-    Fm = M(F)
-    Am = M(A)
-    Bm = M(B)
-
-    nm = np.array((-normal[0], normal[1], normal[2]))
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*nm)
-    glVertex3f(*Fm)
-    glVertex3f(*Am)
-    glVertex3f(*Bm)
-    glEnd()
+    draw_faces(GL_TRIANGLES, BODY_GEOMETRY['fender_to_windshield'])
 
 def draw_side_panel_connector():
     set_material("fender_metal")
-
-    # Pontos do lado direito
-    A = (0.63, 1.19, -0.05)  
-    B = (0.80, 0.77, 0.65)    # fender superior
-    C = door_base_top   
-
-    import numpy as np
-    AB = np.subtract(B, A)
-    AC = np.subtract(C, A)
-    normal = np.cross(AB, AC)
-    normal = normal / np.linalg.norm(normal)   
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*normal)
-    glVertex3f(*A)
-    glVertex3f(*C)  
-    glVertex3f(*B)
-    glEnd()
-
-    def mirror(p): return (-p[0], p[1], p[2])
-
-    A2 = mirror(A)
-    B2 = mirror(B)
-    C2 = mirror(C)
-
-    normal2 = (-normal[0], normal[1], normal[2])
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*normal2)
-    glVertex3f(*A2)
-    glVertex3f(*C2)
-    glVertex3f(*B2)
-    glEnd()
+    draw_faces(GL_TRIANGLES, DOOR_PANEL_GEOMETRY['side_panel_connector'])
 
 
 def draw_side_panel_fill():
     set_material("car_red")
-    import numpy as np
+    draw_faces(GL_QUADS, DOOR_PANEL_GEOMETRY['side_panel_fill'])
 
-    A = np.array((0.93, 0.25, 0.65))
-    E = np.array((0.87, 0.64, 0.65))
-    B = np.array((0.80, 0.77, 0.65))
-    C = np.array(door_base_top)
-    D = np.array(door_base_bottom)
-
-    def N(p1, p2, p3):
-        u = p2 - p1
-        v = p3 - p1
-        n = np.cross(u, v)
-        return n / np.linalg.norm(n)
-
-    n1 = N(A, E, B)
-
-    glBegin(GL_QUADS)
-    glNormal3f(*n1)
-    glVertex3f(*A)
-    glVertex3f(*E)
-    glVertex3f(*B)
-    glVertex3f(*C)
-    glEnd()
-
-
-    n2 = N(A, D, C)
-
-    glBegin(GL_QUADS)
-    glNormal3f(*n2)
-    glVertex3f(*A)
-    glVertex3f(*D)
-    glVertex3f(*C)
-    glVertex3f(*A)
-    glEnd()
-
-    A2 = np.array((-A[0], A[1], A[2]))
-    E2 = np.array((-E[0], E[1], E[2]))
-    B2 = np.array((-B[0], B[1], B[2]))
-    C2 = np.array((-C[0], C[1], C[2]))
-    D2 = np.array((-D[0], D[1], D[2]))
-   
-   #qaud1
-    n1L = -N(A2, E2, B2)
-
-    glBegin(GL_QUADS)
-    glNormal3f(*n1L)
-    glVertex3f(*A2)
-    glVertex3f(*E2)
-    glVertex3f(*B2)
-    glVertex3f(*C2)
-    glEnd()
-
-
-    n2L = N(A2, C2, D2)
-
-    glBegin(GL_QUADS)
-    glNormal3f(*n2L)
-    glVertex3f(*A2)
-    glVertex3f(*C2)
-    glVertex3f(*D2)
-    glVertex3f(*A2)
-    glEnd()
-
-
-def build_quarter_window():
-    import numpy as np
-    global quarter_window_rear, quarter_A, quarter_B, quarter_C
-
-    # Ponto A: topo traseiro da janela da porta
-    quarter_A = np.array(door_glass_top_rear)
-
-    # Ponto B: base traseira da janela da porta
-    quarter_B = np.array(door_base_rear)
-
-    quarter_C = np.array((
-        door_base_rear[0] - 0.07,
-        door_base_rear[1] + 0.07,
-        -1.30
-    ))
-
-    quarter_window_rear = quarter_C
 
 def draw_quarter_window_glass():
-    import numpy as np
     set_material('glass')
 
-    A = quarter_A
-    B = quarter_B
-    C = quarter_C
-
-    AB = B - A
-    AC = C - A
-    n = np.cross(AB, AC)
-    n = n / np.linalg.norm(n)
+    n, (A, B, C) = DOOR_PANEL_GEOMETRY['quarter_window_glass']
 
     for mirror in (1, -1):
         glPushMatrix()
@@ -1486,22 +1810,9 @@ def draw_quarter_window_glass():
 
 
 def draw_upper_side_panel():
-    import numpy as np
-
     set_material('rubber')
 
-    # Pontos do lado direito
-    A = np.array(door_base_rear)    
-    C = np.array(quarter_window_rear)    
-
-
-    A_L = np.array((-A[0], A[1], A[2]))
-    C_L = np.array((-C[0], C[1], C[2]))
-
-    AB = C - A
-    AC = A_L - A
-    normal = np.cross(AB, AC)
-    normal = normal / np.linalg.norm(normal)
+    normal, (A, C, C_L, A_L) = DOOR_PANEL_GEOMETRY['upper_side_panel']
 
     for mirror in (1, -1):
         glPushMatrix()
@@ -1520,26 +1831,9 @@ def draw_upper_side_panel():
         glPopMatrix()
 
 def draw_upper_rear_transition_panel():
-    import numpy as np
-    
     set_material("hood_blue")
 
-    
-    C = np.array(quarter_window_rear)    
-    C_L = np.array((-C[0], C[1], C[2]))  
-
-    rear_z = -1.50  
-    
-    global rear_panel
-    T  = np.array((C[0] ,C[1] -0.04, rear_z)) # direito traseiro
-    T_L = np.array((-C[0] ,C[1] -0.04, rear_z)) # esquerdo traseiro
-
-    rear_panel = T
-
-    AB = T - C
-    AC = C_L - C
-    normal = np.cross(AB, AC)
-    normal = normal / np.linalg.norm(normal)
+    normal, (C, T, T_L, C_L) = DOOR_PANEL_GEOMETRY['upper_rear_transition_panel']
 
     for mirror in (1, -1):
         glPushMatrix()
@@ -1557,20 +1851,9 @@ def draw_upper_rear_transition_panel():
         glPopMatrix()
 
 def draw_rear_transition_panel():
-    import numpy as np
     set_material("rubber")
 
-    P = np.array(rear_panel)            # painel traseiro direito
-    P_L = np.array((-P[0], P[1], P[2])) # painel traseiro esquerdo
-
-    C = np.array((0.575, 0.55, -1.92))    # chassi traseiro direito
-    C_L = np.array((-0.575, 0.55, -1.92)) # chassi traseiro esquerdo
-
- 
-    AB = C - P
-    AC = P_L - P
-    normal = np.cross(AB, AC)
-    normal = normal / np.linalg.norm(normal)
+    normal, (P, C, C_L, P_L) = DOOR_PANEL_GEOMETRY['rear_transition_panel']
 
     for mirror in (1, -1):
         glPushMatrix()
@@ -1591,447 +1874,104 @@ def draw_rear_transition_panel():
 def draw_rear_bumper():
     glPushMatrix()
 
-    set_material('rubber')
-
-    z_chassis_rear = -1.75
-    z_bumper = -1.92
-
-    h_top = 0.55
-    h_bottom = 0.25
-
-    cw = 0.85
-    bw = 1.15 / 2.0
-
-    glBegin(GL_QUADS)
-    glNormal3f(0, 1, -1)
-    glVertex3f(-cw, h_top, z_chassis_rear)
-    glVertex3f(cw, h_top, z_chassis_rear)
-    glVertex3f(bw, h_top, z_bumper)
-    glVertex3f(-bw, h_top, z_bumper)
-    glEnd()
-
-    glBegin(GL_QUADS)
-    glNormal3f(1, 0, 0)
-    glVertex3f(cw, h_top, z_chassis_rear)
-    glVertex3f(cw, h_bottom, z_chassis_rear)
-    glVertex3f(bw, h_bottom, z_bumper)
-    glVertex3f(bw, h_top, z_bumper)
-    glEnd()
-
-    glBegin(GL_QUADS)
-    glNormal3f(-1, 0, 0)
-    glVertex3f(-cw, h_top, z_chassis_rear)
-    glVertex3f(-cw, h_bottom, z_chassis_rear)
-    glVertex3f(-bw, h_bottom, z_bumper)
-    glVertex3f(-bw, h_top, z_bumper)
-    glEnd()
-
-    glBegin(GL_QUADS)
-    glNormal3f(0, 0, -1)
-    glVertex3f(-bw, h_top, z_bumper)
-    glVertex3f(bw, h_top, z_bumper)
-    glVertex3f(bw, h_bottom, z_bumper)
-    glVertex3f(-bw, h_bottom, z_bumper)
-    glEnd()
-
-    glPopMatrix()
-
-
-def draw_fill_rear_gap():
-    glPushMatrix()
-    set_material("hood_blue")
-    import numpy as np
-
-    P1 = np.array((0.575, 0.55, -1.92))
-    P2 = np.array(rear_panel)
-    P3 = np.array((0.85, 0.55, -1.75))
-    P4 = np.array(quarter_window_rear)
-
-    v1 = P2 - P1
-    v2 = P3 - P1
-    normal1 = np.cross(v1, v2)
-    normal1 = normal1 / np.linalg.norm(normal1)
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*normal1)
-    glVertex3f(*P1)
-    glVertex3f(*P2)
-    glVertex3f(*P3)
-    glEnd()
-
-    v3 = P3 - P4
-    v4 = P2 - P4
-    normal2 = np.cross(v3, v4)
-    normal2 = normal2 / np.linalg.norm(normal2)
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*normal2)
-    glVertex3f(*P4)
-    glVertex3f(*P3)
-    glVertex3f(*P2)
-    glEnd()
-
-    P1L = np.array((-P1[0], P1[1], P1[2]))
-    P2L = np.array((-P2[0], P2[1], P2[2]))
-    P3L = np.array((-P3[0], P3[1], P3[2]))
-    P4L = np.array((-P4[0], P4[1], P4[2]))
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(-normal1[0], normal1[1], normal1[2])
-    glVertex3f(*P1L)
-    glVertex3f(*P2L)
-    glVertex3f(*P3L)
-    glEnd()
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(-normal2[0], normal2[1], normal2[2])
-    glVertex3f(*P4L)
-    glVertex3f(*P3L)
-    glVertex3f(*P2L)
-    glEnd()
-
-    glPopMatrix()
-
-def draw_rear_side_panel():
-    glPushMatrix()
-    set_material("fender_metal")
-    import numpy as np
-
-    def N(p1, p2, p3):
-        u = p2 - p1
-        v = p3 - p1
-        n = np.cross(u, v)
-        return n / np.linalg.norm(n)
-
-    A = np.array(door_rear_bottom)    
-    D = np.array((door_base_rear[0], door_base_rear[1] - 0.15, door_base_rear[2]))
-    E = np.array(door_base_rear)
-    B = np.array(( 0.85, 0.55, -1.75))
-    C = np.array(( 0.85, 0.25, -1.75))
- 
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*N(A, C, D))
-    glVertex3f(*A)
-    glVertex3f(*C)
-    glVertex3f(*D)
-    glEnd()
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*N(D, C, B))
-    glVertex3f(*D)
-    glVertex3f(*C)
-    glVertex3f(*B)
-    glEnd()
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*N(D, B, E))
-    glVertex3f(*D)
-    glVertex3f(*B)
-    glVertex3f(*E)
-    glEnd()
-
-
-    A2 = np.array((-door_rear_bottom[0], door_rear_bottom[1], door_rear_bottom[2]))
-    D2 = np.array((-door_base_rear[0], door_base_rear[1] - 0.15, door_base_rear[2]))
-    E2 = np.array((-door_base_rear[0], door_base_rear[1], door_base_rear[2]))
-    B2 = np.array((-0.85, 0.55, -1.75))
-    C2 = np.array((-0.85, 0.25, -1.75))
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*N(A2, D2, C2))
-    glVertex3f(*A2)
-    glVertex3f(*D2)
-    glVertex3f(*C2)
-    glEnd()
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*N(D2, B2, C2))
-    glVertex3f(*D2)
-    glVertex3f(*B2)
-    glVertex3f(*C2)
-    glEnd()
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*N(D2, E2, B2))
-    glVertex3f(*D2)
-    glVertex3f(*E2)
-    glVertex3f(*B2)
-    glEnd()
-
-    glPopMatrix()
-
-def draw_rear_upper_link():
-    glPushMatrix()
-    set_material("fender_metal")
-    import numpy as np
-
-    def N(a, b, c):
-        u = b - a
-        v = c - a
-        n = np.cross(u, v)
-        n = n / np.linalg.norm(n)
-        return n
-
-    # -----------------------------
-    # LADO DIREITO
-    # -----------------------------
-    P1 = np.array(door_base_rear)           
-    P2 = np.array(rear_panel)                
-    P3 = np.array((0.85, 0.55, -1.75))       
-
-    nR = N(P1, P2, P3)
-
-    if nR[0] < 0:
-        nR = -nR
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*nR)
-    glVertex3f(*P1)
-    glVertex3f(*P2)
-    glVertex3f(*P3)
-    glEnd()
-
-    # -----------------------------
-    # LADO ESQUERDO
-    # -----------------------------
-    P1L = np.array((-P1[0], P1[1], P1[2]))
-    P2L = np.array((-P2[0], P2[1], P2[2]))
-    P3L = np.array((-P3[0], P3[1], P3[2]))
-
-    nL = N(P1L, P2L, P3L)
-
-    if nL[0] > 0:
-        nL = -nL
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*nL)
-    glVertex3f(*P1L)
-    glVertex3f(*P2L)
-    glVertex3f(*P3L)
-    glEnd()
-
-    glPopMatrix()
-    
-
-
-def draw_rear_fender_arch():
-    set_material('car_red')
-
-    # -------------------------
-    # Dimensoes
-    # -------------------------
-    arch_x_inner = 0.84
-    thickness    = 0.15
-    arch_x_outer = arch_x_inner + thickness
-
-    cy = 0.34
-    cz = -1.25
-    radius = 0.33
-    segments = 32
-
-    # Semicírculo 
-    start_angle = 0.0          
-    end_angle   = math.pi      
-
-    inward_extra = 0.10          
-
-    def draw_side(sign):
-        glBegin(GL_QUADS)
-
-        for i in range(segments):
-
-            t1 = i / segments
-            t2 = (i+1) / segments
-
-        
-            a1 = start_angle + (end_angle - start_angle) * t1
-            a2 = start_angle + (end_angle - start_angle) * t2
-
-            # arco YZ
-            y1 = cy + radius * math.sin(a1)
-            z1 = cz + radius * math.cos(a1)
-
-            y2 = cy + radius * math.sin(a2)
-            z2 = cz + radius * math.cos(a2)
-
-            # -------------------------
-            # X move-se para dentro ao longo do arco
-            # -------------------------
-            offset1 = t1 * inward_extra
-            offset2 = t2 * inward_extra
-
-            x_inner1 = (arch_x_inner - offset1) * sign
-            x_outer1 = (arch_x_outer - offset1) * sign
-
-            x_inner2 = (arch_x_inner - offset2) * sign
-            x_outer2 = (arch_x_outer - offset2) * sign
-
-            ny = math.sin((a1 + a2) * 0.5)
-            nz = math.cos((a1 + a2) * 0.5)
-            normal_x = sign
-
-            glNormal3f(normal_x, ny * 0.4, nz * 0.4)
-
-            glVertex3f(x_inner1, y1, z1)
-            glVertex3f(x_inner2, y2, z2)
-            glVertex3f(x_outer2, y2, z2)
-            glVertex3f(x_outer1, y1, z1)
-
-        glEnd()
-
-    draw_side(+1)
-    draw_side(-1)
-
-def draw_rear_wheels():
-    radius_front = 0.22
-    wheel_y_front = 0.35 - radius_front + 0.25   
-
-    radius_rear = 0.24
-    width_rear  = 0.20
-
-    wheel_y_rear = wheel_y_front + (radius_front - radius_rear)
-
-    wheel_x = 0.77
-    wheel_z = -1.25
-
-    place_wheel_rear(-wheel_x, wheel_y_rear, wheel_z, radius_rear, width_rear, True,  False)  # trás esquerda
-    place_wheel_rear(+wheel_x, wheel_y_rear, wheel_z, radius_rear, width_rear, False, False)  # trás direita
-
-
-def draw_rear_triangle_piece():
-    import numpy as np
-    set_material("fender_metal")
-
-    A = np.array(rear_panel)
-    B = np.array(door_base_rear)
-    C = np.array(quarter_window_rear)
-
-    # função normal
-    def N(a, b, c):
-        u = b - a
-        v = c - a
-        n = np.cross(u, v)
-        return n / np.linalg.norm(n)
-
-    nR = N(A, B, C)
-
-    if nR[0] < 0:
-        nR = -nR
-
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*nR)
-    glVertex3f(*A)
-    glVertex3f(*B)
-    glVertex3f(*C)
-    glEnd()
-
+    set_material('rubber')
 
-    A2 = np.array([-A[0], A[1], A[2]])
-    B2 = np.array([-B[0], B[1], B[2]])
-    C2 = np.array([-C[0], C[1], C[2]])
+    z_chassis_rear = -1.75
+    z_bumper = -1.92
 
-    nL = N(A2, B2, C2)
+    h_top = 0.55
+    h_bottom = 0.25
 
-    if nL[0] > 0:
-        nL = -nL
+    cw = 0.85
+    bw = 1.15 / 2.0
 
-    glBegin(GL_TRIANGLES)
-    glNormal3f(*nL)
-    glVertex3f(*A2)
-    glVertex3f(*B2)
-    glVertex3f(*C2)
+    glBegin(GL_QUADS)
+    glNormal3f(0, 1, -1)
+    glVertex3f(-cw, h_top, z_chassis_rear)
+    glVertex3f(cw, h_top, z_chassis_rear)
+    glVertex3f(bw, h_top, z_bumper)
+    glVertex3f(-bw, h_top, z_bumper)
     glEnd()
 
-def draw_rear_inner_panel():
-    import numpy as np
-    glPushMatrix()
-    set_material("car_red")
-
-    A = np.array(door_rear_bottom)   # inferior dianteiro
-    B = np.array(door_base_rear)     # superior dianteiro
-
-    A2 = np.array((-A[0], A[1], A[2]))   # inferior traseiro
-    B2 = np.array((-B[0], B[1], B[2]))   # superior traseiro
+    glBegin(GL_QUADS)
+    glNormal3f(1, 0, 0)
+    glVertex3f(cw, h_top, z_chassis_rear)
+    glVertex3f(cw, h_bottom, z_chassis_rear)
+    glVertex3f(bw, h_bottom, z_bumper)
+    glVertex3f(bw, h_top, z_bumper)
+    glEnd()
 
- 
-    v1 = B - A
-    v2 = B2 - A
-    normal = np.cross(v1, v2)
-    normal = normal / np.linalg.norm(normal)
+    glBegin(GL_QUADS)
+    glNormal3f(-1, 0, 0)
+    glVertex3f(-cw, h_top, z_chassis_rear)
+    glVertex3f(-cw, h_bottom, z_chassis_rear)
+    glVertex3f(-bw, h_bottom, z_bumper)
+    glVertex3f(-bw, h_top, z_bumper)
+    glEnd()
 
     glBegin(GL_QUADS)
-    glNormal3f(*normal)
-    glVertex3f(*A)
-    glVertex3f(*B)
-    glVertex3f(*B2)
-    glVertex3f(*A2)
+    glNormal3f(0, 0, -1)
+    glVertex3f(-bw, h_top, z_bumper)
+    glVertex3f(bw, h_top, z_bumper)
+    glVertex3f(bw, h_bottom, z_bumper)
+    glVertex3f(-bw, h_bottom, z_bumper)
     glEnd()
 
     glPopMatrix()
 
 
-def draw_cabin_floor_fill():
-    import numpy as np
-
-    set_material("car_red")
+def draw_fill_rear_gap():
+    glPushMatrix()
+    set_material("hood_blue")
+    draw_faces(GL_TRIANGLES, DOOR_PANEL_GEOMETRY['fill_rear_gap'])
+    glPopMatrix()
 
-    A = np.array((-0.93, 0.25, 0.65))
-    B = np.array(( 0.93, 0.25, 0.65))
-    C = np.array(( 0.80, 0.77, 0.65))
-    D = np.array((-0.80, 0.77, 0.65))
+def draw_rear_side_panel():
+    glPushMatrix()
+    set_material("fender_metal")
+    draw_faces(GL_TRIANGLES, DOOR_PANEL_GEOMETRY['rear_side_panel'])
+    glPopMatrix()
 
-    normal = (0.0, 1.0, 0.0)
+def draw_rear_upper_link():
+    glPushMatrix()
+    set_material("fender_metal")
+    draw_faces(GL_TRIANGLES, DOOR_PANEL_GEOMETRY['rear_upper_link'])
+    glPopMatrix()
+    
 
-    glBegin(GL_QUADS)
-    glNormal3f(*normal)
-    glVertex3f(*A)
-    glVertex3f(*B)
-    glVertex3f(*C)
-    glVertex3f(*D)
-    glEnd()
 
-def draw_car_tablier():
-    import numpy as np
+def draw_rear_fender_arch():
+    set_material('car_red')
+    draw_faces(GL_QUADS, BODY_GEOMETRY['rear_fender_arch'][lod_level])
 
-    set_material("rubber")
+def draw_rear_wheels():
+    draw_wheels(False)
 
-    D1 = np.array(( 0.80, 0.77, 0.65))   # direita baixo
-    D2 = np.array((-0.80, 0.77, 0.65))   # esquerda baixo
-    T1 = np.array(( 0.60, 0.82, 0.65))   # direita cima
-    T2 = np.array((-0.60, 0.82, 0.65))   # esquerda cima
 
-    normal = (0.0, 1.0, 0.0)
+def draw_rear_triangle_piece():
+    set_material("fender_metal")
+    draw_faces(GL_TRIANGLES, DOOR_PANEL_GEOMETRY['rear_triangle_piece'])
 
-    glBegin(GL_QUADS)
-    glNormal3f(*normal)
-    glVertex3f(*D2)   
-    glVertex3f(*D1)
-    glVertex3f(*T1)
-    glVertex3f(*T2)
-    glEnd()
+def draw_rear_inner_panel():
+    glPushMatrix()
+    set_material("car_red")
+    draw_faces(GL_QUADS, DOOR_PANEL_GEOMETRY['rear_inner_panel'])
+    glPopMatrix()
 
-def draw_steering_wheel():
-    import numpy as np
-    from math import acos, degrees
 
-    # -----------------------------
-    # COORDENADAS BRAÇO
-    # -----------------------------
-    P0 = np.array((0.45, 0.72, 0.65))  # origem da coluna
-    P1 = np.array((0.45, 0.72, 0.45))  
+def draw_cabin_floor_fill():
+    set_material("car_red")
+    draw_faces(GL_QUADS, BODY_GEOMETRY['cabin_floor_fill'])
 
-    V = P1 - P0
-    length = np.linalg.norm(V)
-    Vn = V / length
+def draw_car_tablier():
+    set_material("rubber")
+    draw_faces(GL_QUADS, BODY_GEOMETRY['car_tablier'])
 
-    Z = np.array((0.0, 0.0, 1.0))
-    dot = max(-1.0, min(1.0, float(np.dot(Z, Vn))))
-    angle = degrees(acos(dot))
-    axis = np.cross(Z, Vn)
-    axis = axis / np.linalg.norm(axis) if np.linalg.norm(axis) > 1e-6 else np.array((1.0, 0.0, 0.0))
+def draw_steering_column():
+    P0, P1, length, angle, axis = BODY_GEOMETRY['steering_column']
 
     radius = 0.05
-    slices = 24
+    slices = lod(24)
 
     # --------------------------------
     # COLUNA
@@ -2041,13 +1981,12 @@ def draw_steering_wheel():
     glTranslatef(*P0)
     glRotatef(angle, axis[0], axis[1], axis[2])
 
-    quad = gluNewQuadric()
-    gluCylinder(quad, radius, radius, length, slices, 1)
+    gluCylinder(quadric, radius, radius, length, slices, 1)
 
     #tamoa coluna
     glPushMatrix()
     glTranslatef(0, 0, length)  # mover até à ponta
-    gluDisk(quad, 0.0, radius, slices, 1)
+    gluDisk(quadric, 0.0, radius, slices, 1)
     glPopMatrix()
 
     glPopMatrix()
@@ -2057,10 +1996,32 @@ def draw_steering_wheel():
     glTranslatef(*P1)
 
     set_material("rubber")
-    glutSolidTorus(0.03, 0.13, 20, 40)
+    glutSolidTorus(0.03, 0.13, lod(20), lod(40))
+
+    glPopMatrix()
+
+
+steering_matrix_cache = []
+state.subscribe(('wheel_rotation',), steering_matrix_cache.clear)
+
+def steering_spokes_matrix():
+    if not steering_matrix_cache:
+        P1 = (0.45, 0.72, 0.45)
+        steering_matrix_cache.append(translation_matrix(*P1) @ rotation_matrix(state.wheel_rotation, 0, 0, 1))
+    return steering_matrix_cache[0]
+
+def draw_steering_spokes():
+    glPushMatrix()
+    glMultMatrixf(steering_spokes_matrix().T)
+
+    if state.compiled_body:
+        draw_cached('steering_spokes')
+    else:
+        draw_steering_spokes_geometry()
 
-    glRotatef(state['wheel_rotation'], 0, 0, 1)
+    glPopMatrix()
 
+def draw_steering_spokes_geometry():
     #raios
     set_material("metal")
     spokes = [
@@ -2077,18 +2038,1049 @@ def draw_steering_wheel():
         glutSolidCube(1.0)
         glPopMatrix()
 
-    glPopMatrix()
 
+def draw_steering_wheel():
+    draw_steering_column()
+    draw_steering_spokes()
+
+
+# ---------- Compiled body ----------
+# ordem original das peças: as partes fixas entre peças móveis são
+# compiladas em display lists, as móveis continuam a ser desenhadas por frame
+CAR_PARTS = [
+    draw_chassis,
+    draw_hood,
+    draw_front_bumper,
+    draw_fender_upper,
+    draw_fender_middle_and_lower,
+    draw_front_fender_arch,
+    draw_fender_transition,
+    draw_fender_transition_small,
+    draw_front_wheels,
+    draw_windshield_frame,
+    draw_doors,
+    draw_fender_to_windshield,
+    draw_side_panel_connector,
+    draw_side_panel_fill,
+    draw_upper_side_panel,
+    draw_upper_rear_transition_panel,
+    draw_rear_transition_panel,
+    draw_rear_bumper,
+    draw_fill_rear_gap,
+    draw_rear_side_panel,
+    draw_rear_upper_link,
+    draw_rear_fender_arch,
+    draw_rear_wheels,
+    draw_rear_triangle_piece,
+    draw_rear_inner_panel,
+    draw_cabin_floor_fill,
+    draw_car_tablier,
+    draw_steering_column,
+    draw_steering_spokes,
+]
+
+CAR_MOVING_PARTS = {
+    draw_front_wheels,
+    draw_doors,
+    draw_rear_wheels,
+    draw_steering_spokes,
+}
+
+CAR_GLASS_PARTS = [
+    draw_windshield_glass,
+    draw_door_glass,
+    draw_quarter_window_glass,
+]
+
+# zona de cada parte, para saltar o que a câmara não consegue ver (as restantes são 'exterior');
+# 'outer' = exterior que não se vê do lugar do condutor. Pelo nome: o profiler troca as
+# funções por wrappers (com o mesmo __name__)
+CAR_PART_ZONES = {
+    'draw_front_bumper': 'outer',
+    'draw_fender_upper': 'outer',
+    'draw_front_fender_arch': 'outer',
+    'draw_fender_transition': 'outer',
+    'draw_fender_transition_small': 'outer',
+    'draw_front_wheels': 'outer',
+    'draw_upper_side_panel': 'outer',
+    'draw_upper_rear_transition_panel': 'outer',
+    'draw_rear_transition_panel': 'outer',
+    'draw_rear_bumper': 'outer',
+    'draw_fill_rear_gap': 'outer',
+    'draw_rear_side_panel': 'outer',
+    'draw_rear_upper_link': 'outer',
+    'draw_rear_fender_arch': 'outer',
+    'draw_rear_wheels': 'outer',
+    'draw_rear_triangle_piece': 'outer',
+}
+
+def part_zone(part):
+    return CAR_PART_ZONES.get(part.__name__, 'exterior')
+
+# partes móveis com transformação própria, resolvidas uma vez
+WHEEL_ZONE = part_zone(draw_front_wheels)
+DOOR_ZONE = part_zone(draw_doors)
+SPOKES_ZONE = part_zone(draw_steering_spokes)
+
+def compile_list(draw_fn, *args):
+    list_id = glGenLists(1)
+    glNewList(list_id, GL_COMPILE)
+    state.compiled_body = False
+    try:
+        draw_fn(*args)
+    finally:
+        state.compiled_body = True
+    glEndList()
+    return list_id
+
+def draw_parts(parts):
+    for part in parts:
+        part()
+
+def split_segments(parts):
+    # troços consecutivos de partes fixas da mesma zona ('body_N') separados pelas móveis
+    segments = []
+    run = []
+    for part in parts + [None]:
+        if run and (part is None or part in CAR_MOVING_PARTS or part_zone(part) != part_zone(run[0])):
+            segments.append(('body_%d' % len(segments), run))
+            run = []
+        if part in CAR_MOVING_PARTS:
+            segments.append((None, part))
+        elif part is not None:
+            run.append(part)
+    return segments
+
+CAR_SEGMENTS = split_segments(CAR_PARTS)
+
+def segment_zone(name, part):
+    return part_zone(part[0] if name else part)
+
+WHEEL_SIZES = sorted({(radius, width) for _, _, _, radius, width, _, _ in CAR_WHEELS})
+
+def wheel_mesh_name(radius, width):
+    return 'wheel_%g_%g' % (radius, width)
+
+# malhas em cache: nome -> função de desenho e argumentos
+CACHED_MESHES = {}
+for name, parts in CAR_SEGMENTS:
+    if name:
+        CACHED_MESHES[name] = (draw_parts, parts)
+CACHED_MESHES['glass'] = (draw_parts, CAR_GLASS_PARTS)
+CACHED_MESHES['door_left'] = (draw_door_leaf, "left")
+CACHED_MESHES['door_right'] = (draw_door_leaf, "right")
+for radius, width in WHEEL_SIZES:
+    CACHED_MESHES[wheel_mesh_name(radius, width)] = (draw_raw_wheel_geometry, radius, width)
+CACHED_MESHES['ground'] = (draw_ground,)
+CACHED_MESHES['garage_walls'] = (draw_garage_walls,)
+CACHED_MESHES['tree'] = (draw_tree, 0, 0)
+CACHED_MESHES['lamp_post'] = (draw_lamp_post, 0, 0)
+CACHED_MESHES['garage_door'] = (draw_garage_door_geometry,)
+CACHED_MESHES['steering_spokes'] = (draw_steering_spokes_geometry,)
+
+# malhas com vários níveis de detalhe: 'nome@nível' (o nível 0 é o próprio nome)
+LOD_PARTS = {draw_front_fender_arch, draw_rear_fender_arch, draw_steering_column}
+LOD_MESHES = {name for name, parts in CAR_SEGMENTS if name and LOD_PARTS & set(parts)}
+LOD_MESHES |= {wheel_mesh_name(radius, width) for radius, width in WHEEL_SIZES}
+LOD_MESHES |= {'tree', 'lamp_post'}
+
+def lod_mesh_name(name, level):
+    return name if level == 0 else '%s@%d' % (name, level)
+
+def split_lod_name(name):
+    base, _, level = name.partition('@')
+    return base, int(level or 0)
+
+def draw_cached(name):
+    if name in LOD_MESHES:
+        name = lod_from_modelview(name) if prop_lod_level is None else lod_mesh_name(name, prop_lod_level)
+
+    if name in baked_meshes:
+        draw_baked(name)
+        return
+
+    if name not in body_lists:
+        base, level = split_lod_name(name)
+        with lod_detail(level):
+            body_lists[name] = compile_list(*CACHED_MESHES[base])
+    glCallList(body_lists[name])
+
+def draw_car_compiled():
+    # ----------GEOMETRIA OPACA ----------
+    for name, part in CAR_SEGMENTS:
+        if name:
+            draw_cached(name)
+        else:
+            part()
+
+    # ----------GEOMETRIA TRANSPARENTE ----------
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glDepthMask(GL_FALSE)
+
+    draw_cached('glass')
+
+    glDepthMask(GL_TRUE)
+    glDisable(GL_BLEND)
+
+
+# ---------- Baked meshes ----------
+# ficheiro: cabeçalho fixo + tabela JSON + vértices float32 intercalados
+# (posição, normal, texcoord) + índices uint32
+BAKE_FILE = os.path.join(CACHE_DIR, 'meshes.bin')
+BAKE_MAGIC = b'CGMESH\0\0'
+BAKE_VERSION = 1
+BAKE_HEADER = struct.Struct('<8s5I32s')
+
+baked_meshes = {}
+baked_buffers = None
+
+def source_hash():
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+def capture_cached_meshes():
+    recorder = GeometryRecorder()
+    with recording(recorder):
+        for level in range(LOD_LEVELS):
+            with lod_detail(level):
+                # mesma ordem de um frame, para herdar normal/material correntes
+                for name, part in CAR_SEGMENTS:
+                    recorder.begin_part(lod_mesh_name(name or part.__name__, level))
+                    if name:
+                        draw_parts(CACHED_MESHES[name][1])
+                    else:
+                        part()
+                    recorder.end_part()
+                for name, (draw_fn, *args) in CACHED_MESHES.items():
+                    if name.startswith('body_') or (level and name not in LOD_MESHES):
+                        continue
+                    recorder.begin_part(lod_mesh_name(name, level))
+                    draw_fn(*args)
+                    recorder.end_part()
+    return recorder.mesh()
+
+def bake_meshes(path=BAKE_FILE):
+    mesh = capture_cached_meshes()
+
+    vertices, indices = np.unique(mesh.vertices, axis=0, return_inverse=True)
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    triangles = indices.reshape(-1, 3).astype(np.uint32)
+
+    # só os triângulos das malhas da tabela (as passagens de LOD desenham o carro todo)
+    names = list(CACHED_MESHES) + [lod_mesh_name(name, level)
+                                   for level in range(1, LOD_LEVELS) for name in sorted(LOD_MESHES)]
+    table = {}
+    kept = []
+    cursor = 0
+    for name in names:
+        first, count = mesh.part_ranges[name]
+        table[name] = []
+        for material, texture, start, tris in mesh.ranges(first, count):
+            kept.append(triangles[start:start + tris])
+            table[name].append((material, texture, cursor * 3, tris * 3))
+            cursor += tris
+    indices = np.concatenate(kept).reshape(-1)
+    header = json.dumps(table).encode('utf-8')
+
+    def align(n):
+        return (n + 15) & ~15
+
+    vertex_offset = align(BAKE_HEADER.size + len(header))
+    index_offset = align(vertex_offset + vertices.nbytes)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(BAKE_HEADER.pack(BAKE_MAGIC, BAKE_VERSION, len(header),
+                                 len(vertices), len(indices), vertex_offset,
+                                 source_hash()))
+        f.write(header)
+        f.seek(vertex_offset)
+        f.write(vertices.tobytes())
+        f.seek(index_offset)
+        f.write(indices.tobytes())
+    os.replace(tmp, path)
+
+    return len(vertices), len(indices)
+
+def load_baked_meshes(path=BAKE_FILE):
+    # None se o ficheiro não existir ou não corresponder a este SolucaoCG2.py
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(BAKE_HEADER.size)
+            if len(head) < BAKE_HEADER.size:
+                return None
+            (magic, version, header_len, vertex_count,
+             index_count, vertex_offset, digest) = BAKE_HEADER.unpack(head)
+            if magic != BAKE_MAGIC or version != BAKE_VERSION or digest != source_hash():
+                return None
+            table = json.loads(f.read(header_len).decode('utf-8'))
+
+        index_offset = (vertex_offset + vertex_count * 32 + 15) & ~15
+        vertices = np.memmap(path, dtype=np.float32, mode='r',
+                             offset=vertex_offset, shape=(vertex_count, 8))
+        indices = np.memmap(path, dtype=np.uint32, mode='r',
+                            offset=index_offset, shape=(index_count,))
+    except (OSError, ValueError):
+        # ficheiro truncado ou de outro formato: como se não existisse, volta a ser feito
+        return None
+    return table, vertices, indices
+
+def upload_baked_meshes(baked):
+    global baked_buffers
+    table, vertices, indices = baked
+
+    vbo, ibo = glGenBuffers(2)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    baked_buffers = (vbo, ibo)
+    baked_meshes.clear()
+    baked_meshes.update(table)
+
+    for name, ranges in table.items():
+        used = np.concatenate([indices[first:first + count] for _, _, first, count in ranges])
+        mesh_bounds_cache[name] = bounding_sphere(vertices[used, 0:3])
+
+def load_or_bake_meshes(separate_process=False):
+    baked = load_baked_meshes()
+    if baked is None:
+        try:
+            # recording() troca os globais do módulo: com a janela a desenhar, bake noutro processo;
+            # spawn e não fork: este processo tem threads e um contexto GL vivo
+            if separate_process:
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    pool.submit(bake_meshes).result()
+            else:
+                bake_meshes()
+        except (OSError, BrokenProcessPool) as e:
+            print('bake falhou, a usar display lists:', e)
+            return None
+        baked = load_baked_meshes()
+    return baked
+
+def begin_baked():
+    vbo, ibo = baked_buffers
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 32, ctypes.c_void_p(0))
+    glNormalPointer(GL_FLOAT, 32, ctypes.c_void_p(12))
+    glTexCoordPointer(2, GL_FLOAT, 32, ctypes.c_void_p(24))
+
+def end_baked():
+    glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+def draw_baked(name):
+    begin_baked()
+
+    for material, texture, first, count in baked_meshes[name]:
+        if material:
+            set_material(material)
+        if texture:
+            glEnable(GL_TEXTURE_2D)
+            glBindTexture(GL_TEXTURE_2D, textures.get(texture, 0))
+        glDrawElements(GL_TRIANGLES, count, GL_UNSIGNED_INT, ctypes.c_void_p(first * 4))
+        if texture:
+            glDisable(GL_TEXTURE_2D)
+
+    end_baked()
+
+
+# ---------- Render queue ----------
+# estatísticas do último frame (para o HUD)
+render_stats = {}
+
+def count_state_changes(items):
+    materials = texture_binds = 0
+    material = texture = None
+    for item_texture, item_material, _, _, _, _, _ in items:
+        if item_material and item_material != material:
+            materials += 1
+            material = item_material
+        if item_texture and item_texture != texture:
+            texture_binds += 1
+        texture = item_texture
+    return materials, texture_binds
+
+class RenderQueue:
+    # itens: (textura, material, ordem, matriz, primeiro índice, nº de índices, malha)
+    def __init__(self):
+        self.opaque = []
+        self.transparent = []
+        self.props = None        # adereços visíveis, desenhados com instancing
+
+    def submit(self, name, matrix=None, transparent=False, cull=True):
+        if cull and not is_visible(name, matrix):
+            return
+        if name in LOD_MESHES:
+            name = lod_for_world(name, matrix)
+        items = self.transparent if transparent else self.opaque
+        for material, texture, first, count in baked_meshes[name]:
+            items.append((texture or '', material, len(items), matrix, first, count, name))
+
+    def flush(self):
+        unsorted_materials, unsorted_textures = count_state_changes(self.opaque + self.transparent)
+
+        # opacos ordenados por textura/material; os transparentes mantêm a ordem
+        self.opaque.sort(key=lambda item: item[:3])
+
+        self.material = None
+        self.texture = ''
+        self.matrix = None
+        self.material_switches = 0
+        self.texture_binds = 0
+
+        begin_baked()
+        self.issue(self.opaque)
+
+        if self.props is not None:
+            self.set_matrix(None)
+            if self.texture:
+                glDisable(GL_TEXTURE_2D)
+                self.texture = ''
+            prop_instancer.draw(scene, self.props)
+            self.material = None
+
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDepthMask(GL_FALSE)
+
+        self.issue(self.transparent)
+
+        glDepthMask(GL_TRUE)
+        glDisable(GL_BLEND)
+
+        self.set_matrix(None)
+        if self.texture:
+            glDisable(GL_TEXTURE_2D)
+        end_baked()
+
+        render_stats.update({
+            'items': len(self.opaque) + len(self.transparent),
+            'material_switches': self.material_switches,
+            'texture_binds': self.texture_binds,
+            'unsorted_material_switches': unsorted_materials,
+            'unsorted_texture_binds': unsorted_textures,
+            'instances': 0 if self.props is None else len(self.props),
+            'instanced_draws': 0 if self.props is None else prop_instancer.draws,
+        })
+
+    def set_matrix(self, matrix):
+        if matrix is self.matrix:
+            return
+        if self.matrix is not None:
+            glPopMatrix()
+        if matrix is not None:
+            glPushMatrix()
+            glMultMatrixf(matrix.T)
+        self.matrix = matrix
+
+    def issue(self, items):
+        for texture, material, _, matrix, first, count, _ in items:
+            if material and material != self.material:
+                set_material(material)
+                self.material = material
+                self.material_switches += 1
+
+            if texture != self.texture:
+                if not texture:
+                    glDisable(GL_TEXTURE_2D)
+                else:
+                    if not self.texture:
+                        glEnable(GL_TEXTURE_2D)
+                    glBindTexture(GL_TEXTURE_2D, textures.get(texture, 0))
+                    self.texture_binds += 1
+                self.texture = texture
+
+            self.set_matrix(matrix)
+            glDrawElements(GL_TRIANGLES, count, GL_UNSIGNED_INT, ctypes.c_void_p(first * 4))
+
+def car_items():
+    # (malha, matriz no espaço do carro) de tudo o que compõe o carro
+    identity = np.identity(4)
+    items = [(name, identity) for name, part in CAR_SEGMENTS
+             if name and segment_zone(name, part) in car_zones]
+    if WHEEL_ZONE in car_zones:
+        for wheel, (_, _, _, radius, width, _, _) in zip(wheel_transforms(), CAR_WHEELS):
+            items.append((wheel_mesh_name(radius, width), wheel))
+    if DOOR_ZONE in car_zones:
+        for side in ("left", "right"):
+            items.append(('door_' + side, door_matrix(side)))
+    if SPOKES_ZONE in car_zones:
+        items.append(('steering_spokes', steering_spokes_matrix()))
+    return items
+
+def submit_car(queue):
+    car = car_matrix()
+
+    for name, matrix in car_items():
+        queue.submit(name, car @ matrix)
+
+    queue.submit('glass', car, transparent=True)
+
+def submit_scene(queue):
+    queue.submit('ground')
+    queue.submit('garage_walls')
+    queue.submit('garage_door', garage_door_matrix())
+    submit_car(queue)
+
+    # adereços já filtrados pela grelha; o nível de detalhe é guardado por adereço
+    visible = visible_props()
+    scene.update_lod(visible)
+    if state.instancing and prop_instancer.available():
+        queue.props = visible
+        return
+    for index in visible:
+        kind = scene.kinds[scene.types[index]]
+        if kind in LOD_MESHES:
+            kind = lod_mesh_name(kind, scene.lod[index])
+        queue.submit(kind, scene.matrices[index], cull=False)
+
+
+# ---------- Instancing ----------
+# por instância: 3 linhas da matriz afim + tinta (multiplica ambiente/difusa)
+INSTANCE_FLOATS = 16
+INSTANCE_ATTRIBUTES = ('instance_x', 'instance_y', 'instance_z', 'instance_tint')
+
+# iluminação por vértice igual à fixed-function (as duas luzes de setup_lights,
+# material corrente via glMaterial); os adereços não têm textura
+INSTANCE_VERTEX_SHADER = """
+#version 120
+attribute vec4 instance_x;
+attribute vec4 instance_y;
+attribute vec4 instance_z;
+attribute vec4 instance_tint;
+
+void main() {
+    vec4 world = vec4(dot(instance_x, gl_Vertex), dot(instance_y, gl_Vertex),
+                      dot(instance_z, gl_Vertex), 1.0);
+    vec3 normal = vec3(dot(instance_x.xyz, gl_Normal), dot(instance_y.xyz, gl_Normal),
+                       dot(instance_z.xyz, gl_Normal));
+    vec4 eye = gl_ModelViewMatrix * world;
+    vec3 n = normalize(gl_NormalMatrix * normal);
+
+    vec4 ambient = gl_FrontMaterial.ambient * instance_tint;
+    vec4 diffuse = gl_FrontMaterial.diffuse * instance_tint;
+    vec4 color = gl_FrontMaterial.emission + gl_LightModel.ambient * ambient;
+
+    for (int i = 0; i < 2; i++) {
+        vec3 l = gl_LightSource[i].position.xyz;
+        float attenuation = 1.0;
+        if (gl_LightSource[i].position.w != 0.0) {
+            l -= eye.xyz;
+            float d = length(l);
+            attenuation = 1.0 / (gl_LightSource[i].constantAttenuation
+                                 + gl_LightSource[i].linearAttenuation * d
+                                 + gl_LightSource[i].quadraticAttenuation * d * d);
+        }
+        l = normalize(l);
+
+        float lambert = max(dot(n, l), 0.0);
+        vec4 light = gl_LightSource[i].ambient * ambient + lambert * gl_LightSource[i].diffuse * diffuse;
+        if (lambert > 0.0) {
+            float highlight = max(dot(n, normalize(l + vec3(0.0, 0.0, 1.0))), 0.0);
+            light += pow(highlight, gl_FrontMaterial.shininess)
+                     * gl_LightSource[i].specular * gl_FrontMaterial.specular;
+        }
+        color += attenuation * light;
+    }
+
+    gl_FrontColor = vec4(color.rgb, diffuse.a);
+    gl_Position = gl_ProjectionMatrix * eye;
+}
+"""
+
+INSTANCE_FRAGMENT_SHADER = """
+#version 120
+void main() {
+    gl_FragColor = gl_Color;
+}
+"""
+
+def instance_data(matrices, tint):
+    data = np.ones((len(matrices), INSTANCE_FLOATS), dtype=np.float32)
+    data[:, 0:12] = matrices[:, 0:3, :].reshape(-1, 12)
+    data[:, 12:15] = tint
+    return data
+
+class PropInstancer:
+    def __init__(self):
+        self.program = None
+        self.locations = []
+        self.buffer = None
+        self.supported = None
+        self.draws = 0
+
+    def available(self):
+        # compila o programa no primeiro uso; sem GLSL/instancing fica a fila normal
+        if self.supported is None:
+            self.supported = False
+            if bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor):
+                try:
+                    self.program = shaders.compileProgram(
+                        shaders.compileShader(INSTANCE_VERTEX_SHADER, GL_VERTEX_SHADER),
+                        shaders.compileShader(INSTANCE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+                except Exception as e:
+                    print('instancing indisponível:', e)
+                else:
+                    self.locations = [glGetAttribLocation(self.program, name) for name in INSTANCE_ATTRIBUTES]
+                    self.buffer = glGenBuffers(1)
+                    self.supported = True
+        return self.supported
+
+    def draw(self, scene, visible):
+        # um glDrawElementsInstanced por (tipo, nível de detalhe, material)
+        keys = scene.types[visible].astype(np.int64) * LOD_LEVELS + scene.lod[visible]
+        order = np.argsort(keys, kind='stable')
+        data = scene.instance_data[visible[order]]
+        groups, firsts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        glUseProgram(self.program)
+        for location in self.locations:
+            glEnableVertexAttribArray(location)
+            glVertexAttribDivisor(location, 1)
+
+        self.draws = 0
+        for key, first, count in zip(groups, firsts, counts):
+            kind, level = divmod(int(key), LOD_LEVELS)
+            name = scene.kinds[kind]
+            if name in LOD_MESHES:
+                name = lod_mesh_name(name, level)
+
+            for i, location in enumerate(self.locations):
+                offset = (int(first) * INSTANCE_FLOATS + i * 4) * 4
+                glVertexAttribPointer(location, 4, GL_FLOAT, GL_FALSE, INSTANCE_FLOATS * 4,
+                                      ctypes.c_void_p(offset))
+            for material, texture, start, index_count in baked_meshes[name]:
+                if material:
+                    set_material(material)
+                glDrawElementsInstanced(GL_TRIANGLES, index_count, GL_UNSIGNED_INT,
+                                        ctypes.c_void_p(start * 4), int(count))
+                self.draws += 1
+
+        for location in self.locations:
+            glVertexAttribDivisor(location, 0)
+            glDisableVertexAttribArray(location)
+        glUseProgram(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+prop_instancer = PropInstancer()
+
+
+# ---------- Frustum culling ----------
+# esferas envolventes (centro, raio) no espaço local de cada malha
+mesh_bounds_cache = {}
+frustum_planes = None
+frustum_box = None       # AABB do frustum no mundo (mín., máx.)
+cull_stats = {'drawn': 0, 'culled': 0}
+
+def bounding_sphere(points):
+    points = np.asarray(points, dtype=np.float64)
+    center = (points.min(axis=0) + points.max(axis=0)) * 0.5
+    return center, float(np.sqrt(((points - center) ** 2).sum(axis=1).max()))
+
+def mesh_bounds(name):
+    # sem malhas baked: capturar a geometria uma vez
+    if name not in mesh_bounds_cache:
+        mesh_bounds_cache[name] = bounding_sphere(capture_geometry(*CACHED_MESHES[name]).positions)
+    return mesh_bounds_cache[name]
+
+def transform_sphere(sphere, matrix):
+    center, radius = sphere
+    if matrix is None:
+        return center, radius
+    scale = np.sqrt((matrix[0:3, 0:3] ** 2).sum(axis=0)).max()
+    return matrix[0:3, 0:3] @ center + matrix[0:3, 3], radius * scale
+
+def merge_spheres(spheres):
+    centers = np.array([c for c, _ in spheres])
+    radii = np.array([r for _, r in spheres])
+    center = ((centers - radii[:, None]).min(axis=0) + (centers + radii[:, None]).max(axis=0)) * 0.5
+    return center, float((np.linalg.norm(centers - center, axis=1) + radii).max())
+
+def update_frustum():
+    # planos de clip = linhas de projeção * modelview (Gribb/Hartmann), no espaço do mundo
+    global frustum_planes, frustum_box
+    projection = np.array(glGetDoublev(GL_PROJECTION_MATRIX)).reshape(4, 4).T
+    modelview = np.array(glGetDoublev(GL_MODELVIEW_MATRIX)).reshape(4, 4).T
+    clip = projection @ modelview
+
+    planes = np.array([
+        clip[3] + clip[0], clip[3] - clip[0],   # esquerda, direita
+        clip[3] + clip[1], clip[3] - clip[1],   # baixo, cima
+        clip[3] + clip[2], clip[3] - clip[2],   # perto, longe
+    ])
+    frustum_planes = planes / np.linalg.norm(planes[:, 0:3], axis=1)[:, None]
+
+    corners = np.array([(x, y, z, 1.0) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)])
+    corners = corners @ np.linalg.inv(clip).T
+    corners = corners[:, 0:3] / corners[:, 3:4]
+    frustum_box = corners.min(axis=0), corners.max(axis=0)
+    cull_stats['drawn'] = 0
+    cull_stats['culled'] = 0
+
+    update_lod_view(modelview, projection)
+    update_car_zones()
+
+def sphere_visible(sphere):
+    if frustum_planes is None or not state.frustum_culling:
+        cull_stats['drawn'] += 1
+        return True
+    center, radius = sphere
+    inside = (frustum_planes[:, 0:3] @ center + frustum_planes[:, 3] >= -radius).all()
+    cull_stats['drawn' if inside else 'culled'] += 1
+    return inside
+
+def is_visible(name, matrix=None):
+    return sphere_visible(transform_sphere(mesh_bounds(name), matrix))
+
+def car_visible():
+    sphere = merge_spheres([transform_sphere(mesh_bounds(name), m) for name, m in car_items()]
+                           + [mesh_bounds('glass')])
+    return sphere_visible(transform_sphere(sphere, car_matrix()))
+
+
+# ---------- Level of detail ----------
+# raio projetado (píxeis) abaixo do qual se passa ao nível seguinte
+LOD_PIXELS = (24.0, 8.0)
+LOD_HYSTERESIS = 0.2     # margem para não alternar entre níveis a cada frame
+
+view_matrix = np.identity(4)
+lod_pixel_scale = 0.0
+lod_levels = {}          # (malha, ocorrência no frame) -> nível atual
+prop_lod_level = None    # nível do adereço a ser desenhado (display lists)
+lod_counts = {}
+lod_stats = [0] * LOD_LEVELS
+
+def update_lod_view(modelview, projection):
+    global view_matrix, lod_pixel_scale
+    view_matrix = modelview
+    viewport_height = glGetIntegerv(GL_VIEWPORT)[3]
+    lod_pixel_scale = projection[1, 1] * viewport_height * 0.5
+    lod_counts.clear()
+    lod_stats[:] = [0] * LOD_LEVELS
+
+def next_lod(levels, pixels):
+    # nível atual limitado ao intervalo que a histerese permite
+    thresholds = np.array(LOD_PIXELS)
+    coarsest = (pixels[..., None] < thresholds * (1 - LOD_HYSTERESIS)).sum(axis=-1)
+    finest = (pixels[..., None] <= thresholds * (1 + LOD_HYSTERESIS)).sum(axis=-1)
+    return np.clip(levels, coarsest, finest)
+
+def select_lod(name, distance, radius):
+    # a n-ésima vez que a malha aparece no frame identifica a instância
+    occurrence = lod_counts.get(name, 0)
+    lod_counts[name] = occurrence + 1
+    key = (name, occurrence)
+
+    level = 0
+    if state.lod:
+        pixels = radius * lod_pixel_scale / max(distance, 1e-6)
+        level = int(next_lod(np.array(lod_levels.get(key, 0)), np.array(pixels)))
+
+    lod_levels[key] = level
+    lod_stats[level] += 1
+    return lod_mesh_name(name, level)
+
+def lod_for_world(name, matrix):
+    center, radius = transform_sphere(mesh_bounds(name), matrix)
+    return select_lod(name, np.linalg.norm(view_matrix[0:3, 0:3] @ center + view_matrix[0:3, 3]), radius)
+
+@contextmanager
+def prop_lod(level):
+    # adereços: o nível vem de Scene.update_lod, com histerese pelo índice do adereço
+    # (a ordem de ocorrência muda quando o culling tira adereços do frame)
+    global prop_lod_level
+    saved = prop_lod_level
+    prop_lod_level = int(level)
+    try:
+        yield
+    finally:
+        prop_lod_level = saved
+
+def lod_from_modelview(name):
+    # display lists: a matriz corrente já está no espaço da câmara
+    modelview = np.array(glGetDoublev(GL_MODELVIEW_MATRIX)).reshape(4, 4).T
+    center, radius = transform_sphere(mesh_bounds(name), modelview)
+    return select_lod(name, np.linalg.norm(center), radius)
+
+
+# ---------- Car zones ----------
+# zona: modos de câmara em que é desenhada; 0 orbit, 1 follow, 2 interior.
+# Só se salta o que está garantidamente tapado: de fora o interior vê-se pelos
+# vidros e pelas portas abertas, por isso é sempre desenhado
+CAR_ZONE_RULES = {
+    'exterior': {0, 1, 2},
+    'outer': {0, 1},
+}
+
+car_zones = set(CAR_ZONE_RULES)
+zone_stats = {'meshes': 0, 'triangles': 0}
+
+def car_mesh_zones():
+    # malhas da fila/bake de cada zona
+    zones = {name: segment_zone(name, part) for name, part in CAR_SEGMENTS if name}
+    zones.update({wheel_mesh_name(radius, width): WHEEL_ZONE
+                  for radius, width in WHEEL_SIZES})
+    zones.update({'door_left': DOOR_ZONE, 'door_right': DOOR_ZONE,
+                  'steering_spokes': SPOKES_ZONE})
+    return zones
+
+CAR_MESH_ZONES = car_mesh_zones()
+
+def update_car_zones():
+    global car_zones
+
+    # immediate mode e display lists herdam o material da parte anterior:
+    # só a fila (cada intervalo baked tem o seu material) pode saltar partes
+    if state.car_zones and state.compiled_body and baked_meshes:
+        car_zones = {zone for zone, modes in CAR_ZONE_RULES.items()
+                     if state.camera_mode in modes}
+    else:
+        car_zones = set(CAR_ZONE_RULES)
+
+    # o que se poupa neste frame (triângulos só com malhas baked)
+    hidden = [name for name, zone in CAR_MESH_ZONES.items() if zone not in car_zones]
+    zone_stats['meshes'] = len(hidden)
+    zone_stats['triangles'] = sum(count for name in hidden
+                                  for _, _, _, count in baked_meshes.get(name, ())) // 3
+
+
+# ---------- Scene index ----------
+GRID_PROPS_PER_CELL = 8     # ocupação média pretendida por célula
+GRID_MIN_CELL = 4.0
+
+def prop_matrices(positions, yaw, scale):
+    # (N,4,4): translação @ rotação em y @ escala uniforme
+    c = np.cos(np.radians(yaw)) * scale
+    s = np.sin(np.radians(yaw)) * scale
+    m = np.zeros((len(positions), 4, 4))
+    m[:, 0, 0] = c
+    m[:, 0, 2] = s
+    m[:, 1, 1] = scale
+    m[:, 2, 0] = -s
+    m[:, 2, 2] = c
+    m[:, 0:3, 3] = positions
+    m[:, 3, 3] = 1.0
+    return m
+
+def concat_ranges(starts, ends):
+    # índices de todos os intervalos [start, end) concatenados, sem ciclo
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+class Scene:
+    def __init__(self, kinds, types, positions, yaw=None, scale=None, tint=None):
+        self.kinds = list(kinds)
+        self.types = np.asarray(types, dtype=np.int32)
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        count = len(self.types)
+        self.yaw = np.zeros(count) if yaw is None else np.asarray(yaw, dtype=np.float64)
+        self.scale = np.ones(count) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.tint = np.ones((count, 3)) if tint is None else np.asarray(tint, dtype=np.float64).reshape(-1, 3)
+
+        for kind in self.kinds:
+            if kind not in PROP_DRAW:
+                raise ValueError(f"tipo de adereço desconhecido: {kind}")
+
+        self.matrices = prop_matrices(self.positions, self.yaw, self.scale)
+        self.instance_data = instance_data(self.matrices, self.tint)
+        self.lod = np.zeros(count, dtype=np.int8)
+        self.bounds = None
+        self.build_grid()
+
+    def __len__(self):
+        return len(self.types)
+
+    @classmethod
+    def from_props(cls, props):
+        kinds = list(dict.fromkeys(kind for kind, _, _ in props))
+        return cls(kinds, [kinds.index(kind) for kind, _, _ in props],
+                   [(x, 0.0, z) for _, x, z in props])
+
+    def build_grid(self):
+        # grelha uniforme em xz: adereços ordenados por célula (chave = iz*nx + ix)
+        xz = self.positions[:, [0, 2]]
+        lo = xz.min(axis=0) if len(self) else np.zeros(2)
+        hi = xz.max(axis=0) if len(self) else np.zeros(2)
+        area = max(float(np.prod(hi - lo)), 1.0)
+        self.cell = max(GRID_MIN_CELL, math.sqrt(area * GRID_PROPS_PER_CELL / max(len(self), 1)))
+        self.origin = lo
+        self.dims = ((hi - lo) // self.cell).astype(int) + 1
+
+        ix, iz = self.cell_index(xz).T
+        keys = iz * self.dims[0] + ix
+        self.order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=int(self.dims.prod()))
+        self.starts = np.concatenate(([0], np.cumsum(counts)))
+
+    def cell_index(self, xz):
+        return np.clip(((xz - self.origin) // self.cell).astype(int), 0, self.dims - 1)
+
+    def prop_bounds(self):
+        # esferas envolventes no mundo: centros (N,3), raios (N,) e maior raio
+        if self.bounds is None:
+            spheres = [mesh_bounds(kind) for kind in self.kinds]
+            local = np.array([center for center, _ in spheres]).reshape(-1, 3)[self.types]
+            radii = np.array([radius for _, radius in spheres])[self.types] * self.scale
+            centers = np.einsum('nij,nj->ni', self.matrices[:, 0:3, 0:3], local) + self.positions
+            self.bounds = centers, radii, float(radii.max(initial=0.0))
+        return self.bounds
+
+    def cells_in(self, lo, hi):
+        # chaves das células que cobrem o retângulo xz [lo, hi]
+        if (hi < self.origin).any() or (lo >= self.origin + self.dims * self.cell).any():
+            return np.zeros(0, dtype=int)
+        first, last = self.cell_index(np.array((lo, hi)))
+        ix, iz = np.meshgrid(np.arange(first[0], last[0] + 1), np.arange(first[1], last[1] + 1))
+        return (iz * self.dims[0] + ix).ravel()
+
+    def props_in(self, keys):
+        return self.order[concat_ranges(self.starts[keys], self.starts[keys + 1])]
+
+    def query_radius(self, x, z, radius):
+        centers, radii, max_radius = self.prop_bounds()
+        reach = radius + max_radius
+        candidates = self.props_in(self.cells_in(np.array((x - reach, z - reach)),
+                                                 np.array((x + reach, z + reach))))
+        distance = np.hypot(centers[candidates, 0] - x, centers[candidates, 2] - z)
+        return np.sort(candidates[distance <= radius + radii[candidates]])
+
+    def query_frustum(self, planes, box):
+        centers, radii, max_radius = self.prop_bounds()
+        if not len(self):
+            return np.zeros(0, dtype=int)
+
+        # células dentro da caixa do frustum, testadas como AABB (vértice positivo)
+        lo, hi = box
+        keys = self.cells_in(lo[[0, 2]] - max_radius, hi[[0, 2]] + max_radius)
+        ix, iz = keys % self.dims[0], keys // self.dims[0]
+        cell_lo = np.column_stack((self.origin[0] + ix * self.cell - max_radius,
+                                   np.full(len(keys), (centers[:, 1] - radii).min()),
+                                   self.origin[1] + iz * self.cell - max_radius))
+        cell_hi = np.column_stack((cell_lo[:, 0] + self.cell + 2 * max_radius,
+                                   np.full(len(keys), (centers[:, 1] + radii).max()),
+                                   cell_lo[:, 2] + self.cell + 2 * max_radius))
+        normals = planes[:, 0:3]
+        corner = np.where(normals[None] > 0, cell_hi[:, None], cell_lo[:, None])
+        inside = ((corner * normals[None]).sum(axis=2) + planes[:, 3] >= 0).all(axis=1)
+
+        candidates = self.props_in(keys[inside])
+        distance = centers[candidates] @ normals.T + planes[:, 3]
+        return np.sort(candidates[(distance >= -radii[candidates, None]).all(axis=1)])
+
+    def update_lod(self, visible):
+        # histerese por adereço, vetorizada
+        lod_kinds = np.array([kind in LOD_MESHES for kind in self.kinds])
+        visible = visible[lod_kinds[self.types[visible]]]
+        if not state.lod:
+            self.lod[visible] = 0
+        else:
+            centers, radii, _ = self.prop_bounds()
+            eye = centers[visible] @ view_matrix[0:3, 0:3].T + view_matrix[0:3, 3]
+            pixels = radii[visible] * lod_pixel_scale / np.maximum(np.linalg.norm(eye, axis=1), 1e-6)
+            self.lod[visible] = next_lod(self.lod[visible], pixels)
+        for level, count in enumerate(np.bincount(self.lod[visible], minlength=LOD_LEVELS)):
+            lod_stats[level] += int(count)
+
+def load_scene(path):
+    # JSON: {"props": [{"type", "position": [x, y, z], "yaw", "scale", "tint"}]}; .npz: os mesmos arrays
+    if path.lower().endswith('.json'):
+        with open(path) as f:
+            props = json.load(f)['props']
+        kinds = list(dict.fromkeys(p['type'] for p in props))
+        return Scene(kinds, [kinds.index(p['type']) for p in props],
+                     [p['position'] for p in props],
+                     [p.get('yaw', 0.0) for p in props],
+                     [p.get('scale', 1.0) for p in props],
+                     [p.get('tint', (1.0, 1.0, 1.0)) for p in props])
+
+    with np.load(path, allow_pickle=False) as data:
+        return Scene(data['kinds'].tolist(), data['types'], data['positions'],
+                     data['yaw'], data['scale'], data['tint'] if 'tint' in data else None)
+
+def save_scene(scene, path):
+    if path.lower().endswith('.json'):
+        props = [{'type': scene.kinds[t], 'position': [round(float(v), 4) for v in p],
+                  'yaw': round(float(yaw), 3), 'scale': round(float(scale), 4),
+                  'tint': [round(float(v), 3) for v in tint]}
+                 for t, p, yaw, scale, tint in zip(scene.types, scene.positions, scene.yaw,
+                                                   scene.scale, scene.tint)]
+        with open(path, 'w') as f:
+            json.dump({'props': props}, f)
+    else:
+        with open(path, 'wb') as f:
+            np.savez(f, kinds=np.array(scene.kinds), types=scene.types,
+                     positions=scene.positions.astype(np.float32),
+                     yaw=scene.yaw.astype(np.float32), scale=scene.scale.astype(np.float32),
+                     tint=scene.tint.astype(np.float32))
+
+def random_scene(count, seed=0):
+    # ~16 m² por adereço, à volta da origem
+    rng = np.random.default_rng(seed)
+    extent = max(10.0, 2.0 * math.sqrt(count))
+    kinds = list(PROP_DRAW)
+    positions = np.zeros((count, 3))
+    positions[:, [0, 2]] = rng.uniform(-extent, extent, (count, 2))
+    return Scene(kinds, rng.integers(0, len(kinds), count), positions,
+                 rng.uniform(0.0, 360.0, count), rng.uniform(0.8, 1.2, count),
+                 rng.uniform(0.8, 1.1, (count, 3)))
+
+def make_scene():
+    index = sys.argv.index('--make-scene')
+    count, path = int(sys.argv[index + 1]), sys.argv[index + 2]
+    generated = random_scene(count)
+    save_scene(generated, path)
+    print(f"{path}: {len(generated)} adereços, grelha {generated.dims[0]}x{generated.dims[1]} "
+          f"(células de {generated.cell:.1f})")
+
+def visible_props():
+    if frustum_planes is None or not state.frustum_culling:
+        visible = np.arange(len(scene))
+    else:
+        visible = scene.query_frustum(frustum_planes, frustum_box)
+    cull_stats['drawn'] += len(visible)
+    cull_stats['culled'] += len(scene) - len(visible)
+    return visible
+
+scene = Scene.from_props(SCENE_PROPS)
+
+
+car_matrix_cache = []
+state.subscribe(('car_pos', 'car_heading'), car_matrix_cache.clear)
+
+def car_matrix():
+    if not car_matrix_cache:
+        carx, cary, carz = state.car_pos
+        car_matrix_cache.append(translation_matrix(carx, cary, carz)
+                                @ rotation_matrix(state.car_heading, 0, 1, 0)
+                                @ translation_matrix(0, -0.13, 0))
+    return car_matrix_cache[0]
 
 def draw_car():
     glPushMatrix()
+    glMultMatrixf(car_matrix().T)
 
-    carx, cary, carz = state['car_pos']
-    heading = state['car_heading']
-
-    glTranslatef(carx, cary, carz)
-    glRotatef(heading, 0, 1, 0)
-    glTranslatef(0, -0.13, 0)
+    if state.compiled_body:
+        draw_car_compiled()
+        glPopMatrix()
+        return
 
     # ----------GEOMETRIA OPACA ----------
     draw_chassis()
@@ -2104,10 +3096,6 @@ def draw_car():
 
     draw_doors()
 
-    # pontos do vidro da porta usados em outras funções
-    compute_door_glass_points()
-    build_quarter_window()
-
     draw_fender_to_windshield()
     draw_side_panel_connector()
     draw_side_panel_fill()
@@ -2143,6 +3131,394 @@ def draw_car():
 
     
 
+# ---------- Geometry capture ----------
+# matrizes 4x4 (vetores coluna), equivalentes a glTranslatef/glRotatef/glScalef
+def translation_matrix(x, y, z):
+    m = np.identity(4)
+    m[:3, 3] = (x, y, z)
+    return m
+
+def rotation_matrix(angle, x, y, z):
+    axis = np.array((x, y, z), dtype=float)
+    x, y, z = axis / np.linalg.norm(axis)
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    t = 1.0 - c
+
+    m = np.identity(4)
+    m[:3, :3] = ((t*x*x + c,   t*x*y - s*z, t*x*z + s*y),
+                 (t*x*y + s*z, t*y*y + c,   t*y*z - s*x),
+                 (t*x*z - s*y, t*y*z + s*x, t*z*z + c))
+    return m
+
+def scale_matrix(x, y, z):
+    return np.diag((x, y, z, 1.0))
+
+
+# primitivas GLU/GLUT emitidas com glBegin/glVertex (funcionam com o
+# recorder e com um contexto GL real)
+def solid_cube(size):
+    h = size / 2.0
+    faces = (
+        (( 1, 0, 0), (( h,-h,-h), ( h, h,-h), ( h, h, h), ( h,-h, h))),
+        ((-1, 0, 0), ((-h,-h, h), (-h, h, h), (-h, h,-h), (-h,-h,-h))),
+        (( 0, 1, 0), ((-h, h,-h), (-h, h, h), ( h, h, h), ( h, h,-h))),
+        (( 0,-1, 0), ((-h,-h,-h), ( h,-h,-h), ( h,-h, h), (-h,-h, h))),
+        (( 0, 0, 1), ((-h,-h, h), ( h,-h, h), ( h, h, h), (-h, h, h))),
+        (( 0, 0,-1), ((-h,-h,-h), (-h, h,-h), ( h, h,-h), ( h,-h,-h))),
+    )
+    glBegin(GL_QUADS)
+    for n, quad in faces:
+        glNormal3f(*n)
+        for v in quad:
+            glVertex3f(*v)
+    glEnd()
+
+def solid_sphere(radius, slices, stacks):
+    glBegin(GL_QUADS)
+    for i in range(stacks):
+        t1 = math.pi * i / stacks
+        t2 = math.pi * (i + 1) / stacks
+        for j in range(slices):
+            p1 = 2.0 * math.pi * j / slices
+            p2 = 2.0 * math.pi * (j + 1) / slices
+            for t, p in ((t1, p1), (t2, p1), (t2, p2), (t1, p2)):
+                nx = math.sin(t) * math.cos(p)
+                ny = math.sin(t) * math.sin(p)
+                nz = math.cos(t)
+                glNormal3f(nx, ny, nz)
+                glVertex3f(radius * nx, radius * ny, radius * nz)
+    glEnd()
+
+def solid_torus(inner_radius, outer_radius, sides, rings):
+    glBegin(GL_QUADS)
+    for i in range(rings):
+        a1 = 2.0 * math.pi * i / rings
+        a2 = 2.0 * math.pi * (i + 1) / rings
+        for j in range(sides):
+            b1 = 2.0 * math.pi * j / sides
+            b2 = 2.0 * math.pi * (j + 1) / sides
+            for a, b in ((a1, b1), (a2, b1), (a2, b2), (a1, b2)):
+                nx = math.cos(b) * math.cos(a)
+                ny = math.cos(b) * math.sin(a)
+                nz = math.sin(b)
+                r = outer_radius + inner_radius * math.cos(b)
+                glNormal3f(nx, ny, nz)
+                glVertex3f(r * math.cos(a), r * math.sin(a), inner_radius * nz)
+    glEnd()
+
+def quadric_cylinder(base, top, height, slices, stacks):
+    nz = (base - top) / height
+    glBegin(GL_QUADS)
+    for i in range(stacks):
+        z1 = height * i / stacks
+        z2 = height * (i + 1) / stacks
+        r1 = base + (top - base) * i / stacks
+        r2 = base + (top - base) * (i + 1) / stacks
+        for j in range(slices):
+            a1 = 2.0 * math.pi * j / slices
+            a2 = 2.0 * math.pi * (j + 1) / slices
+            for a, r, z, s, t in ((a1, r1, z1, j, i), (a2, r1, z1, j + 1, i),
+                                  (a2, r2, z2, j + 1, i + 1), (a1, r2, z2, j, i + 1)):
+                glNormal3f(math.cos(a), math.sin(a), nz)
+                glTexCoord2f(s / slices, t / stacks)
+                glVertex3f(r * math.cos(a), r * math.sin(a), z)
+    glEnd()
+
+def quadric_disk(inner, outer, slices, loops):
+    glNormal3f(0, 0, 1)
+    glBegin(GL_QUADS)
+    for i in range(loops):
+        r1 = inner + (outer - inner) * i / loops
+        r2 = inner + (outer - inner) * (i + 1) / loops
+        for j in range(slices):
+            a1 = 2.0 * math.pi * j / slices
+            a2 = 2.0 * math.pi * (j + 1) / slices
+            for a, r in ((a1, r1), (a1, r2), (a2, r2), (a2, r1)):
+                x = r * math.cos(a)
+                y = r * math.sin(a)
+                glTexCoord2f(0.5 + x / (2.0 * outer), 0.5 + y / (2.0 * outer))
+                glVertex3f(x, y, 0.0)
+    glEnd()
+
+
+class TextureNames(dict):
+    # sem contexto GL as texturas são identificadas pelo nome
+    def __missing__(self, name):
+        return name
+
+    def get(self, name, default=None):
+        return name
+
+
+class CapturedMesh:
+    def __init__(self, vertices, tri_material, tri_texture, materials, texture_names,
+                 part_ranges, primitive_counts):
+        # vertices: float32 (N, 8) = posição, normal, texcoord; 3 vértices por triângulo
+        self.vertices = vertices
+        self.tri_material = tri_material
+        self.tri_texture = tri_texture
+        self.materials = materials
+        self.texture_names = texture_names
+        self.part_ranges = part_ranges
+        self.primitive_counts = primitive_counts
+
+    @property
+    def positions(self):
+        return self.vertices[:, 0:3]
+
+    @property
+    def normals(self):
+        return self.vertices[:, 3:6]
+
+    @property
+    def texcoords(self):
+        return self.vertices[:, 6:8]
+
+    @property
+    def triangle_count(self):
+        return len(self.tri_material)
+
+    def ranges(self, first=0, count=None):
+        # troços de triângulos consecutivos com o mesmo material e textura:
+        # (material, textura, primeiro triângulo, nº de triângulos)
+        end = self.triangle_count if count is None else first + count
+        out = []
+        start = first
+        for i in range(first + 1, end + 1):
+            if (i == end or self.tri_material[i] != self.tri_material[start]
+                    or self.tri_texture[i] != self.tri_texture[start]):
+                tex = self.tri_texture[start]
+                out.append((self.materials[self.tri_material[start]],
+                            self.texture_names[tex] if tex >= 0 else None,
+                            start, i - start))
+                start = i
+        return out
+
+
+class GeometryRecorder:
+    def __init__(self, material=None):
+        self.stack = [np.identity(4)]
+        self.normal = (0.0, 0.0, 1.0)
+        self.texcoord = (0.0, 0.0)
+        self.material = material
+        self.texture = None
+        self.texturing = False
+
+        self.mode = None
+        self.prim_positions = []
+        self.prim_normals = []
+        self.prim_texcoords = []
+
+        self.chunks = []
+        self.tri_material = []
+        self.tri_texture = []
+        self.materials = []
+        self.texture_names = []
+        self.part_ranges = {}
+        self.primitive_counts = {}
+        self.triangles = 0
+
+    # ---- estado ----
+    def set_material(self, name):
+        self.material = name
+
+    def glEnable(self, cap):
+        if cap == GL_TEXTURE_2D:
+            self.texturing = True
+
+    def glDisable(self, cap):
+        if cap == GL_TEXTURE_2D:
+            self.texturing = False
+
+    def glBindTexture(self, target, texture):
+        self.texture = texture
+
+    def glNormal3f(self, x, y, z):
+        self.normal = (float(x), float(y), float(z))
+
+    def glTexCoord2f(self, s, t):
+        self.texcoord = (float(s), float(t))
+
+    # ---- matrizes ----
+    def glPushMatrix(self):
+        self.stack.append(self.stack[-1].copy())
+
+    def glPopMatrix(self):
+        self.stack.pop()
+
+    def glLoadIdentity(self):
+        self.stack[-1] = np.identity(4)
+
+    def glMultMatrixf(self, m):
+        self.stack[-1] = self.stack[-1] @ np.asarray(m, dtype=float).reshape(4, 4).T
+
+    def glTranslatef(self, x, y, z):
+        self.stack[-1] = self.stack[-1] @ translation_matrix(x, y, z)
+
+    def glRotatef(self, angle, x, y, z):
+        self.stack[-1] = self.stack[-1] @ rotation_matrix(angle, x, y, z)
+
+    def glScalef(self, x, y, z):
+        self.stack[-1] = self.stack[-1] @ scale_matrix(x, y, z)
+
+    # ---- primitivas ----
+    def glBegin(self, mode):
+        self.mode = mode
+        self.prim_positions = []
+        self.prim_normals = []
+        self.prim_texcoords = []
+
+    def glVertex3f(self, x, y, z):
+        self.prim_positions.append((float(x), float(y), float(z)))
+        self.prim_normals.append(self.normal)
+        self.prim_texcoords.append(self.texcoord)
+
+    def glEnd(self):
+        n = len(self.prim_positions)
+        mode = self.mode
+        self.mode = None
+
+        if mode == GL_TRIANGLES:
+            idx = [i for i in range(n - n % 3)]
+        elif mode == GL_QUADS:
+            idx = []
+            for q in range(0, n - n % 4, 4):
+                idx += (q, q + 1, q + 3, q + 1, q + 2, q + 3)
+        elif mode in (GL_TRIANGLE_FAN, GL_POLYGON):
+            idx = []
+            for i in range(1, n - 1):
+                idx += (0, i, i + 1)
+        elif mode == GL_TRIANGLE_STRIP:
+            idx = []
+            for i in range(n - 2):
+                idx += (i, i + 1, i + 2) if i % 2 == 0 else (i + 1, i, i + 2)
+        elif mode == GL_QUAD_STRIP:
+            idx = []
+            for i in range(0, n - 3, 2):
+                idx += (i, i + 1, i + 3, i, i + 3, i + 2)
+        else:
+            # linhas/pontos não fazem parte da malha
+            return
+
+        key = int(mode)
+        self.primitive_counts[key] = self.primitive_counts.get(key, 0) + 1
+        if not idx:
+            return
+
+        m = self.stack[-1]
+        normal_matrix = np.linalg.inv(m[:3, :3]).T
+
+        pos = np.array(self.prim_positions)[idx]
+        nor = np.array(self.prim_normals)[idx]
+        tex = np.array(self.prim_texcoords)[idx]
+
+        pos = pos @ m[:3, :3].T + m[:3, 3]
+        nor = nor @ normal_matrix.T
+        length = np.linalg.norm(nor, axis=1, keepdims=True)
+        nor = np.divide(nor, length, out=np.zeros_like(nor), where=length > 0)
+
+        self.chunks.append(np.hstack((pos, nor, tex)))
+
+        count = len(idx) // 3
+        self.tri_material += [self.material_index(self.material)] * count
+        tex_id = self.texture_index(self.texture) if self.texturing else -1
+        self.tri_texture += [tex_id] * count
+        self.triangles += count
+
+    def material_index(self, name):
+        name = name or ''
+        if name not in self.materials:
+            self.materials.append(name)
+        return self.materials.index(name)
+
+    def texture_index(self, name):
+        if name not in self.texture_names:
+            self.texture_names.append(name)
+        return self.texture_names.index(name)
+
+    def begin_part(self, name):
+        self.part_start = self.triangles
+        self.part_name = name
+
+    def end_part(self):
+        self.part_ranges[self.part_name] = (self.part_start, self.triangles - self.part_start)
+
+    def bindings(self):
+        noop = lambda *args, **kwargs: None
+        bound = {name: getattr(self, name) for name in (
+            'glBegin', 'glEnd', 'glVertex3f', 'glNormal3f', 'glTexCoord2f',
+            'glPushMatrix', 'glPopMatrix', 'glLoadIdentity', 'glMultMatrixf',
+            'glTranslatef', 'glRotatef', 'glScalef',
+            'glEnable', 'glDisable', 'glBindTexture', 'set_material')}
+        bound.update({
+            'glMaterialfv': noop, 'glMaterialf': noop,
+            'glBlendFunc': noop, 'glDepthMask': noop,
+            'gluNewQuadric': noop,
+            'gluCylinder': lambda quad, *args: quadric_cylinder(*args),
+            'gluDisk': lambda quad, *args: quadric_disk(*args),
+            'glutSolidCube': solid_cube,
+            'glutSolidSphere': solid_sphere,
+            'glutSolidTorus': solid_torus,
+            'textures': TextureNames(),
+        })
+        return bound
+
+    def mesh(self):
+        if self.chunks:
+            vertices = np.vstack(self.chunks).astype(np.float32)
+        else:
+            vertices = np.zeros((0, 8), dtype=np.float32)
+        return CapturedMesh(vertices,
+                            np.array(self.tri_material, dtype=np.int32),
+                            np.array(self.tri_texture, dtype=np.int32),
+                            list(self.materials), list(self.texture_names),
+                            dict(self.part_ranges), dict(self.primitive_counts))
+
+
+@contextmanager
+def recording(recorder):
+    # troca as funções GL globais do módulo pelas do recorder
+    module = globals()
+    bindings = recorder.bindings()
+    saved = {name: module[name] for name in bindings}
+    saved_compiled = state.compiled_body
+    module.update(bindings)
+    state.compiled_body = False
+    try:
+        yield recorder
+    finally:
+        module.update(saved)
+        state.compiled_body = saved_compiled
+
+
+def capture_geometry(draw_fn, *args, material=None):
+    recorder = GeometryRecorder(material)
+    with recording(recorder):
+        draw_fn(*args)
+    return recorder.mesh()
+
+def capture_parts(parts, material=None):
+    recorder = GeometryRecorder(material)
+    with recording(recorder):
+        for part in parts:
+            recorder.begin_part(part.__name__)
+            part()
+            recorder.end_part()
+    return recorder.mesh()
+
+def capture_car():
+    return capture_parts(CAR_PARTS + CAR_GLASS_PARTS)
+
+def print_capture_stats():
+    mesh = capture_car()
+    print(f"{'parte':<34}{'triângulos':>12}{'vértices':>10}  materiais")
+    for name, (first, count) in mesh.part_ranges.items():
+        materials = sorted({m for m, _, _, _ in mesh.ranges(first, count)})
+        print(f"{name:<34}{count:>12}{count * 3:>10}  {', '.join(materials)}")
+    print(f"{'total':<34}{mesh.triangle_count:>12}{len(mesh.vertices):>10}")
+
+
 def setup_lights():
     glEnable(GL_LIGHTING)
     glEnable(GL_NORMALIZE)
@@ -2168,20 +3544,33 @@ def setup_lights():
 
 
 # ---------- Camera ----------
+# matriz da câmara (lida do GL depois do gluLookAt) só muda com a pose e a câmara
+camera_view_cache = []
+state.subscribe(('car_pos', 'car_heading', 'camera_mode', 'cam_azim', 'cam_elev', 'cam_dist'),
+                camera_view_cache.clear)
+
 def apply_camera():
     glMatrixMode(GL_MODELVIEW)
+    if camera_view_cache:
+        glLoadMatrixd(camera_view_cache[0])
+        return
+
+    look_at_camera()
+    camera_view_cache.append(glGetDoublev(GL_MODELVIEW_MATRIX))
+
+def look_at_camera():
     glLoadIdentity()
 
-    carx, cary, carz = state['car_pos']
-    heading = math.radians(state['car_heading'])
+    carx, cary, carz = state.car_pos
+    heading = math.radians(state.car_heading)
 
-    if state['camera_mode'] == 0:
+    if state.camera_mode == 0:
         # ============================
         #   MODO 0: ORBIT FOLLOW
         # ============================
-        az = math.radians(state['cam_azim'])
-        el = math.radians(state['cam_elev'])
-        d  = state['cam_dist']
+        az = math.radians(state.cam_azim)
+        el = math.radians(state.cam_elev)
+        d  = state.cam_dist
 
         cx = carx + d * math.cos(el) * math.cos(az)
         cy = cary + 1.5 + d * math.sin(el)
@@ -2191,7 +3580,7 @@ def apply_camera():
                   carx, cary + 0.7, carz,
                   0, 1, 0)
 
-    elif state['camera_mode'] == 1:
+    elif state.camera_mode == 1:
         # ============================
         #   MODO 1: FOLLOW REAL
         # ============================
@@ -2207,7 +3596,7 @@ def apply_camera():
                   carx + x_dir, cary + 0.7, carz + z_dir,
                   0, 1, 0)
 
-    elif state['camera_mode'] == 2:
+    elif state.camera_mode == 2:
     # ============================
     #   MODO 2: CÂMARA INTERIOR
     # ============================
@@ -2237,34 +3626,67 @@ def apply_camera():
 
     
 # ---------- Display ----------
-def display():
+def display(width=None, height=None):
+    width = width or WINDOW_W
+    height = height or WINDOW_H
+
+    if profiler.enabled:
+        profiler.begin_frame()
+    if tracer.enabled:
+        tracer.begin_frame()
+
+    if sim_worker:
+        frame_start, sim_start = time.perf_counter(), sim_worker.busy()
+        consume_snapshot()
+
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    glViewport(0,0,WINDOW_W,WINDOW_H)
+    glViewport(0,0,width,height)
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
-    gluPerspective(60.0, float(WINDOW_W)/float(WINDOW_H), 0.1, 200.0)
+    gluPerspective(60.0, float(width)/float(height), 0.1, 200.0)
 
     apply_camera()
+    update_frustum()
 
-    draw_ground()
-    draw_garage()
-    draw_car()  
-    draw_tree(-8,8)
-    draw_tree(6,-6)
-    draw_tree(6,10)
-    draw_tree(-8,-6)
-    draw_lamp_post(-9,2)
-    draw_lamp_post(8,3)
-
-    if state['show_help']:
-        draw_help_overlay()
+    if state.compiled_body and baked_meshes:
+        queue = RenderQueue()
+        submit_scene(queue)
+        queue.flush()
+    else:
+        draw_ground()
+        if is_visible('garage_walls'):
+            draw_garage()
+        if car_visible():
+            draw_car()
+        visible = visible_props()
+        scene.update_lod(visible)
+        for index in visible:
+            glPushMatrix()
+            glMultMatrixf(scene.matrices[index].T)
+            with prop_lod(scene.lod[index]):
+                PROP_DRAW[scene.kinds[scene.types[index]]](0, 0)
+            glPopMatrix()
+
+    if state.show_help:
+        draw_help_overlay(width, height)
+
+    if tracer.enabled and tracer.end_frame():
+        tracer.disable()
+        print('trace:', tracer.export() + '.csv')
+
+    if profiler.enabled:
+        profiler.end_frame()
+        draw_profiler_overlay(width, height)
+
+    if sim_worker:
+        record_overlap(frame_start, sim_start)
 
     glutSwapBuffers()
 
 # ---------- HUD ----------
-def draw_text_2d(x,y,text):
+def draw_text_2d(x,y,text,width=WINDOW_W,height=WINDOW_H):
     glMatrixMode(GL_PROJECTION)
-    glPushMatrix(); glLoadIdentity(); glOrtho(0,WINDOW_W,0,WINDOW_H,-1,1)
+    glPushMatrix(); glLoadIdentity(); glOrtho(0,width,0,height,-1,1)
     glMatrixMode(GL_MODELVIEW)
     glPushMatrix(); glLoadIdentity()
     glDisable(GL_LIGHTING)
@@ -2275,16 +3697,387 @@ def draw_text_2d(x,y,text):
     glEnable(GL_LIGHTING)
     glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
 
-def draw_help_overlay():
+def draw_help_overlay(width=WINDOW_W, height=WINDOW_H):
     lines = [
-        'Controlos: WASD | G Garagem | V Camera | MoveCamera setas',
-        f"Pos: x={state['car_pos'][0]:.2f} z={state['car_pos'][2]:.2f}"
+        'Controlos: WASD | G Garagem | V Camera | C Compilado | P Profiler | T Trace GL | MoveCamera setas',
+        f"Pos: x={state.car_pos[0]:.2f} z={state.car_pos[2]:.2f}"
     ]
-    y = WINDOW_H - 20
+    if state.compiled_body and render_stats:
+        lines.append(
+            f"Fila: {render_stats['items']} itens | "
+            f"materiais {render_stats['material_switches']} (sem ordenar {render_stats['unsorted_material_switches']}) | "
+            f"texturas {render_stats['texture_binds']} (sem ordenar {render_stats['unsorted_texture_binds']})")
+        if render_stats['instances']:
+            lines.append(
+                f"Instancing (I): {render_stats['instances']} adereços em "
+                f"{render_stats['instanced_draws']} draws")
+
+    lines.append(
+        f"Culling ({'F' if state.frustum_culling else 'F desligado'}): "
+        f"desenhados {cull_stats['drawn']} | fora da vista {cull_stats['culled']}")
+    lines.append(
+        f"Zonas ({'Z' if state.car_zones else 'Z desligado'}): {', '.join(sorted(car_zones))} | "
+        f"poupadas {zone_stats['meshes']} malhas, {zone_stats['triangles']} triângulos")
+    lines.append(
+        f"LOD ({'O' if state.lod else 'O desligado'}): "
+        + ' | '.join(f"nível {level}: {count}" for level, count in enumerate(lod_stats)))
+    lines.append(
+        f"Redesenho (E): {'a pedido' if state.on_demand else 'contínuo'}")
+    if sim_worker:
+        frame_ms, sim_ms, overlap = overlap_summary()
+        lines.append(
+            f"Simulação em thread: passo {thread_stats['sequence']} | "
+            f"snapshot com {thread_stats['age_ms']:.1f} ms | "
+            f"{sim_ms:.2f} ms a simular por frame de {frame_ms:.2f} ms ({overlap:.0f}% sobreposto)")
+
+    y = height - 20
     for l in lines:
-        draw_text_2d(10,y,l)
+        draw_text_2d(10,y,l,width,height)
         y -= 18
 
+# ---------- Profiler ----------
+PROFILER_WINDOW = 240     # frames guardados para médias e percentis
+PROFILER_TOP = 12
+PROFILER_SYNC = True      # glFinish à volta de cada parte: tempo real da GPU
+
+# partes do carro + chamadas de display(); draw_cached é separado por malha e,
+# no caminho compilado, cada item da fila conta para a malha que desenha
+PROFILED_NAMES = [part.__name__ for part in CAR_PARTS + CAR_GLASS_PARTS] + [
+    'draw_car', 'draw_car_compiled', 'draw_ground', 'draw_garage',
+    'draw_tree', 'draw_lamp_post', 'draw_help_overlay', 'submit_scene', 'draw_cached',
+]
+
+class FrameProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.samples = {}
+        self.frame_times = deque(maxlen=PROFILER_WINDOW)
+        self.frame = {}
+        self.frame_start = 0.0
+        self.originals = {}
+
+    def timed(self, name, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            label = name if name != 'draw_cached' else 'draw_cached:' + args[0]
+            if PROFILER_SYNC:
+                glFinish()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if PROFILER_SYNC:
+                    glFinish()
+                self.frame[label] = self.frame.get(label, 0.0) + time.perf_counter() - start
+        return wrapper
+
+    def timed_issue(self, issue):
+        # um item de cada vez: o tempo vai para a malha (body_3, door_left, tree@1...)
+        @functools.wraps(issue)
+        def wrapper(queue, items):
+            for item in items:
+                if PROFILER_SYNC:
+                    glFinish()
+                start = time.perf_counter()
+                issue(queue, (item,))
+                if PROFILER_SYNC:
+                    glFinish()
+                label = item[6]
+                self.frame[label] = self.frame.get(label, 0.0) + time.perf_counter() - start
+        return wrapper
+
+    def enable(self):
+        # só aqui as funções são embrulhadas: desligado não custa nada
+        module = globals()
+        wrappers = {}
+        for name in PROFILED_NAMES:
+            original = module[name]
+            self.originals[name] = original
+            module[name] = wrappers[original] = self.timed(name, original)
+
+        self.originals['RenderQueue.flush'] = RenderQueue.flush
+        RenderQueue.flush = self.timed('RenderQueue.flush', RenderQueue.flush)
+        self.originals['RenderQueue.issue'] = RenderQueue.issue
+        RenderQueue.issue = self.timed_issue(RenderQueue.issue)
+        self.originals['PropInstancer.draw'] = PropInstancer.draw
+        PropInstancer.draw = self.timed('PropInstancer.draw', PropInstancer.draw)
+
+        # referências guardadas fora dos globais
+        self.saved_props = dict(PROP_DRAW)
+        self.saved_segments = list(CAR_SEGMENTS)
+        PROP_DRAW.update({k: wrappers.get(fn, fn) for k, fn in PROP_DRAW.items()})
+        CAR_SEGMENTS[:] = [(name, part if name else wrappers.get(part, part))
+                           for name, part in CAR_SEGMENTS]
+        self.enabled = True
+
+    def disable(self):
+        module = globals()
+        RenderQueue.flush = self.originals.pop('RenderQueue.flush')
+        RenderQueue.issue = self.originals.pop('RenderQueue.issue')
+        PropInstancer.draw = self.originals.pop('PropInstancer.draw')
+        module.update(self.originals)
+        self.originals = {}
+        PROP_DRAW.update(self.saved_props)
+        CAR_SEGMENTS[:] = self.saved_segments
+        self.enabled = False
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def begin_frame(self):
+        self.frame = {}
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if PROFILER_SYNC:
+            glFinish()
+        self.frame_times.append(time.perf_counter() - self.frame_start)
+        for label, seconds in self.frame.items():
+            self.samples.setdefault(label, deque(maxlen=PROFILER_WINDOW)).append(seconds)
+
+    def stats(self):
+        rows = []
+        for label, values in self.samples.items():
+            ms = np.array(values) * 1000.0
+            rows.append({
+                'part': label,
+                'frames': len(ms),
+                'avg_ms': float(ms.mean()),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'max_ms': float(ms.max()),
+            })
+        rows.sort(key=lambda r: r['avg_ms'], reverse=True)
+        return rows
+
+    def frame_stats(self):
+        if not self.frame_times:
+            return {}
+        ms = np.array(self.frame_times) * 1000.0
+        return {
+            'frames': len(ms),
+            'avg_ms': float(ms.mean()),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)),
+            'max_ms': float(ms.max()),
+        }
+
+    def dump(self, path=None):
+        path = path or time.strftime('profile_%Y%m%d_%H%M%S.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'window': PROFILER_WINDOW,
+                'sync': PROFILER_SYNC,
+                'frame': self.frame_stats(),
+                'parts': self.stats(),
+                'frame_times_ms': [t * 1000.0 for t in self.frame_times],
+            }, f, indent=2)
+        return path
+
+profiler = FrameProfiler()
+
+def draw_frame_graph(x, y, w, h, width, height):
+    times = [t * 1000.0 for t in profiler.frame_times]
+    scale = max(max(times, default=0.0), 33.3)
+
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix(); glLoadIdentity(); glOrtho(0,width,0,height,-1,1)
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix(); glLoadIdentity()
+    glDisable(GL_LIGHTING)
+    glDisable(GL_DEPTH_TEST)
+
+    # fundo + linhas de 16.7 ms (60 fps) e 33.3 ms (30 fps)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glColor4f(0, 0, 0, 0.5)
+    glBegin(GL_QUADS)
+    glVertex2f(x, y); glVertex2f(x + w, y); glVertex2f(x + w, y + h); glVertex2f(x, y + h)
+    glEnd()
+    glDisable(GL_BLEND)
+
+    glColor3f(0.4, 0.4, 0.4)
+    glBegin(GL_LINES)
+    for ref in (1000.0 / 60.0, 1000.0 / 30.0):
+        glVertex2f(x, y + h * ref / scale); glVertex2f(x + w, y + h * ref / scale)
+    glEnd()
+
+    glColor3f(0.2, 1.0, 0.2)
+    glBegin(GL_LINE_STRIP)
+    for i, t in enumerate(times):
+        glVertex2f(x + w * i / PROFILER_WINDOW, y + h * t / scale)
+    glEnd()
+
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_LIGHTING)
+    glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
+
+def draw_profiler_overlay(width=WINDOW_W, height=WINDOW_H):
+    frame = profiler.frame_stats()
+    lines = ['Profiler (P desliga | J grava JSON)']
+    if frame:
+        lines.append(f"frame: média {frame['avg_ms']:.2f} ms | p95 {frame['p95_ms']:.2f} | p99 {frame['p99_ms']:.2f}")
+    lines.append(f"{'parte':<28} média   p95   p99 (ms)")
+    for row in profiler.stats()[:PROFILER_TOP]:
+        lines.append(f"{row['part']:<28} {row['avg_ms']:5.2f} {row['p95_ms']:5.2f} {row['p99_ms']:5.2f}")
+
+    x = width - 420
+    y = height - 20
+    for l in lines:
+        draw_text_2d(x,y,l,width,height)
+        y -= 16
+
+    draw_frame_graph(x, y - 90, 400, 80, width, height)
+
+# ---------- GL trace ----------
+TRACE_FRAMES = 60
+TRACE_ARG_CHARS = 80
+TRACE_HELPERS = {'draw_faces'}   # ajudantes genéricos: conta para quem os chamou
+
+def used_gl_names():
+    # nomes gl*/glu*/glut* referidos pelas funções deste ficheiro
+    names = set()
+
+    def visit(code):
+        names.update(n for n in code.co_names if n.startswith('gl'))
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                visit(const)
+
+    module = globals()
+    for obj in list(module.values()):
+        if isinstance(obj, type) and obj.__module__ == __name__:
+            for attr in vars(obj).values():
+                if isinstance(attr, types.FunctionType):
+                    visit(attr.__code__)
+        elif isinstance(obj, types.FunctionType) and obj.__module__ == __name__:
+            visit(obj.__code__)
+    return sorted(n for n in names if callable(module.get(n)))
+
+def trace_caller():
+    # a draw_* mais próxima na pilha; senão quem chamou diretamente
+    frame = sys._getframe(2)
+    caller = frame.f_code.co_qualname
+    while frame is not None:
+        name = frame.f_code.co_name
+        if name.startswith('draw_') and name not in TRACE_HELPERS:
+            return name
+        frame = frame.f_back
+    return caller
+
+class GLTracer:
+    def __init__(self):
+        self.enabled = False
+        self.frames = []
+        self.frame = None
+        self.stream = None
+        self.frames_left = 0
+        self.originals = {}
+
+    def traced(self, name, fn):
+        def wrapper(*args):
+            if self.frame is not None:
+                caller = trace_caller()
+                self.frame[caller, name] += 1
+                if self.stream is not None:
+                    self.stream.append((caller, name, [repr(a)[:TRACE_ARG_CHARS] for a in args]))
+            return fn(*args)
+        return wrapper
+
+    def enable(self, frames=TRACE_FRAMES, prefix=None, record_stream=True):
+        module = globals()
+        for name in used_gl_names():
+            self.originals[name] = module[name]
+            module[name] = self.traced(name, module[name])
+        self.frames = []
+        self.frames_left = frames
+        self.prefix = prefix or time.strftime('trace_%Y%m%d_%H%M%S')
+        self.record_stream = record_stream
+        self.stream_frame = None
+        self.enabled = True
+
+    def disable(self):
+        globals().update(self.originals)
+        self.originals = {}
+        self.frame = None
+        self.enabled = False
+
+    def begin_frame(self):
+        self.frame = Counter()
+        # só o primeiro frame guarda a sequência completa de comandos
+        if self.record_stream and not self.frames:
+            self.stream = []
+
+    def end_frame(self):
+        self.frames.append(self.frame)
+        if self.stream is not None:
+            self.stream_frame = self.stream
+            self.stream = None
+        self.frame = None
+        self.frames_left -= 1
+        return self.frames_left <= 0
+
+    def totals(self):
+        total = Counter()
+        for frame in self.frames:
+            total.update(frame)
+        return total
+
+    def rows(self):
+        n = max(len(self.frames), 1)
+        rows = [(caller, name, count, count / n) for (caller, name), count in self.totals().items()]
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows
+
+    def print_table(self, top=30):
+        print(f"{len(self.frames)} frames")
+        print(f"{'caller':<34}{'função':<24}{'por frame':>10}")
+        for caller, name, _, per_frame in self.rows()[:top]:
+            print(f"{caller:<34}{name:<24}{per_frame:>10.1f}")
+
+        by_name = Counter()
+        for (_, name), count in self.totals().items():
+            by_name[name] += count
+        n = max(len(self.frames), 1)
+        print(f"total: {sum(by_name.values()) / n:.0f} chamadas por frame")
+        for name, count in by_name.most_common(10):
+            print(f"  {name:<24}{count / n:>10.1f}")
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['caller', 'function', 'calls', 'calls_per_frame'])
+            writer.writerows(self.rows())
+
+    def write_stream(self, path):
+        with open(path, 'w') as f:
+            for caller, name, args in self.stream_frame or []:
+                f.write(json.dumps({'caller': caller, 'call': name, 'args': args}) + '\n')
+
+    def export(self):
+        self.print_table()
+        self.write_csv(self.prefix + '.csv')
+        if self.stream_frame:
+            self.write_stream(self.prefix + '_frame.jsonl')
+        return self.prefix
+
+tracer = GLTracer()
+
+def run_trace(options):
+    renderer = HeadlessRenderer(options.width, options.height)
+    if '--immediate' in sys.argv:
+        state.compiled_body = False
+
+    # primeiro frame fora do trace: compila listas e caches
+    renderer.render()
+
+    tracer.enable(options.frames, options.out)
+    while tracer.enabled:
+        renderer.render()
+
 def keyboard(key, x, y):
     k = key.decode('utf-8') if isinstance(key, bytes) else key
 
@@ -2292,87 +4085,555 @@ def keyboard(key, x, y):
     if k in ('q','Q','\x1b'):
         sys.exit(0)
 
-    # abrir/fechar garagem
-    if k in ('g','G'):
-        state['garage_open'] = not state['garage_open']
+    # profiler por parte / gravar estatísticas
+    if k in ('p','P'):
+        profiler.toggle()
+
+    if k in ('j','J') and profiler.samples:
+        print('profiler:', profiler.dump())
+
+    # trace das chamadas GL dos próximos TRACE_FRAMES frames
+    if k in ('t','T') and not tracer.enabled:
+        tracer.enable()
+
+    # frustum culling ligado / desligado
+    if k in ('f','F'):
+        state.frustum_culling = not state.frustum_culling
+
+    # níveis de detalhe ligados / desligados
+    if k in ('o','O'):
+        state.lod = not state.lod
+
+    # saltar partes do carro que a câmara não vê
+    if k in ('z','Z'):
+        state.car_zones = not state.car_zones
+
+    # adereços com instancing / um item da fila por adereço
+    if k in ('i','I'):
+        state.instancing = not state.instancing
+
+    # alternar carroçaria compilada / immediate mode
+    if k in ('c','C'):
+        state.compiled_body = not state.compiled_body
+
+    # redesenhar só quando algo muda / a cada frame
+    if k in ('e','E'):
+        state.on_demand = not state.on_demand
 
     # mudar camera
     if k in ('v','V'):
-        if k in ('v','V'): state['camera_mode'] = (state['camera_mode'] + 1) % 3
-
-    if k in ('l', 'L'):
-        # esquerda = lado X negativo
-        state['right_door_open'] = not state['right_door_open']
+        if k in ('v','V'): state.camera_mode = (state.camera_mode + 1) % 3
 
-    if k in ('r', 'R'):
-        # direita = lado X positivo
-        state['left_door_open'] = not state['left_door_open']
+    # portas, garagem e WASD: no thread da simulação, se existir
+    if sim_worker:
+        sim_worker.send(k, True)
+    else:
+        sim_key(state, keys, k, True)
 
-    # marcar tecla como pressionada
-    if k in keys:
-        keys[k] = True
+    request_redraw()
 
 
 
 def keyboard_up(key, x, y):
     k = key.decode('utf-8') if isinstance(key, bytes) else key
 
-    if k in keys:
-        keys[k] = False
+    if sim_worker:
+        sim_worker.send(k, False)
+    else:
+        sim_key(state, keys, k, False)
+
+    request_redraw()
+
+def sim_key(sim, held, k, pressed):
+    if pressed:
+        # abrir/fechar garagem
+        if k in ('g','G'):
+            sim.garage_open = not sim.garage_open
+
+        if k in ('l', 'L'):
+            # esquerda = lado X negativo
+            sim.right_door_open = not sim.right_door_open
+
+        if k in ('r', 'R'):
+            # direita = lado X positivo
+            sim.left_door_open = not sim.left_door_open
+
+    # marcar tecla como pressionada / largada
+    if k in held:
+        held[k] = pressed
 
 def special_input(key, x, y):
     if key == GLUT_KEY_LEFT:
-        state['cam_azim'] -= 5.0
+        state.cam_azim -= 5.0
     elif key == GLUT_KEY_RIGHT:
-        state['cam_azim'] += 5.0
+        state.cam_azim += 5.0
     elif key == GLUT_KEY_UP:
-        state['cam_elev'] = min(state['cam_elev'] + 5.0, 89.0)
+        state.cam_elev = min(state.cam_elev + 5.0, 89.0)
     elif key == GLUT_KEY_DOWN:
-        state['cam_elev'] = max(state['cam_elev'] - 5.0, -10.0)
+        state.cam_elev = max(state.cam_elev - 5.0, -10.0)
 
+    request_redraw()
 
-def idle():
+
+# ---------- Simulation ----------
+def simulation_step(sim=state, held=keys):
+    # um passo fixo de SIM_DT segundos
+    scale = SIM_STEP_SCALE
 
     # ---- virar para a esquerda ----
-    if keys['a']:
-        state['steer_angle'] = max(state['steer_angle'] - STEER_STEP, -30)
-        state['wheel_rotation'] = max(state['wheel_rotation'] - 5, -250)
+    if held['a']:
+        sim.steer_angle = max(sim.steer_angle - STEER_STEP * scale, -30)
+        sim.wheel_rotation = max(sim.wheel_rotation - 5 * scale, -250)
 
     # ---- virar para a direita (D) ----
-    if keys['d']:
-        state['steer_angle'] = min(state['steer_angle'] + STEER_STEP, 30)
-        state['wheel_rotation'] = min(state['wheel_rotation'] + 5, 250)
+    if held['d']:
+        sim.steer_angle = min(sim.steer_angle + STEER_STEP * scale, 30)
+        sim.wheel_rotation = min(sim.wheel_rotation + 5 * scale, 250)
 
 
         # ---- andar para a frente ----
-    if keys['w']:
-        steering_rad = math.radians(state['steer_angle'])
+    if held['w']:
+        steering_rad = math.radians(sim.steer_angle)
 
-        state['car_heading'] -= math.degrees(math.sin(steering_rad) * TURN_FACTOR)
+        sim.car_heading -= math.degrees(math.sin(steering_rad) * TURN_FACTOR * scale)
 
-        heading = math.radians(state['car_heading'])
-        state['car_pos'][0] += math.sin(heading) * MOVE_STEP
-        state['car_pos'][2] += math.cos(heading) * MOVE_STEP
+        heading = math.radians(sim.car_heading)
+        x, y, z = sim.car_pos
+        sim.car_pos = (x + math.sin(heading) * MOVE_STEP * scale, y,
+                       z + math.cos(heading) * MOVE_STEP * scale)
 
-        state['wheel_spin'] -= WHEEL_SPIN_STEP
+        sim.wheel_spin -= WHEEL_SPIN_STEP * scale
 
 
     # ---- andar para trás ----
-    if keys['s']:
-        steering_rad = math.radians(state['steer_angle'])
-        state['car_heading'] -= math.degrees(math.sin(-steering_rad) * TURN_FACTOR)
+    if held['s']:
+        steering_rad = math.radians(sim.steer_angle)
+        sim.car_heading -= math.degrees(math.sin(-steering_rad) * TURN_FACTOR * scale)
+
+        heading = math.radians(sim.car_heading)
+
+        x, y, z = sim.car_pos
+        sim.car_pos = (x - math.sin(heading) * MOVE_STEP * scale, y,
+                       z - math.cos(heading) * MOVE_STEP * scale)
+
+        sim.wheel_spin += WHEEL_SPIN_STEP * scale
+
+    animate(SIM_DT, sim)
+
+def ease(t):
+    # smoothstep: arranca e pára devagar
+    return t * t * (3.0 - 2.0 * t)
+
+def animate(dt, sim=state):
+    # só o progresso muda; a matriz da porta é recalculada pela subscrição
+    for target, progress, duration in ANIMATIONS:
+        goal = 1.0 if getattr(sim, target) else 0.0
+        current = getattr(sim, progress)
+        if current < goal:
+            setattr(sim, progress, min(current + dt / duration, goal))
+        elif current > goal:
+            setattr(sim, progress, max(current - dt / duration, goal))
+
+def settle_animations():
+    # frames isolados (render farm, headless): portas já no fim da animação
+    for target, progress, _ in ANIMATIONS:
+        setattr(state, progress, 1.0 if getattr(state, target) else 0.0)
+
+def sim_snapshot(sim=state, fields=SIM_FIELDS):
+    return {k: getattr(sim, k) for k in fields}
+
+def restore_sim_state(snapshot):
+    state.update(snapshot)
+
+def interpolate_sim_state(prev, curr, alpha):
+    # o que é desenhado fica entre os dois últimos passos
+    for k in SIM_FIELDS:
+        a, b = prev[k], curr[k]
+        if k == 'car_pos':
+            setattr(state, k, [a[i] + (b[i] - a[i]) * alpha for i in range(3)])
+        else:
+            setattr(state, k, a + (b - a) * alpha)
+
+def advance_simulation(now):
+    global sim_time, sim_accumulator, sim_prev, sim_curr
+
+    if sim_time is None:
+        sim_time = now
+        sim_prev = sim_curr = sim_snapshot()
+        return 0
+
+    sim_accumulator += now - sim_time
+    sim_time = now
+
+    # voltar ao último estado simulado (state pode ter valores interpolados)
+    restore_sim_state(sim_curr)
+
+    steps = 0
+    while sim_accumulator >= SIM_DT and steps < MAX_SIM_STEPS:
+        sim_prev = sim_curr
+        simulation_step()
+        sim_curr = sim_snapshot()
+        sim_accumulator -= SIM_DT
+        steps += 1
+
+    # máquina demasiado lenta: descartar o atraso em vez de acumular
+    if steps == MAX_SIM_STEPS:
+        sim_accumulator = min(sim_accumulator, SIM_DT)
+
+    interpolate_sim_state(sim_prev, sim_curr, sim_accumulator / SIM_DT)
+    return steps
+
+def enable_vsync():
+    # pede ao driver para sincronizar glutSwapBuffers com o monitor
+    try:
+        from OpenGL.GLX import glXGetCurrentDisplay, glXGetCurrentDrawable
+        from OpenGL.GLX.EXT.swap_control import glXSwapIntervalEXT
+        glXSwapIntervalEXT(glXGetCurrentDisplay(), glXGetCurrentDrawable(), 1)
+        return True
+    except Exception:
+        pass
+    try:
+        from OpenGL.WGL.EXT.swap_control import wglSwapIntervalEXT
+        return bool(wglSwapIntervalEXT(1))
+    except Exception:
+        return False
+
+def idle():
+    global next_frame_time
+
+    now = time.monotonic()
+
+    # limitador de frames: dormir em vez de ocupar o CPU
+    if frame_interval and now < next_frame_time:
+        time.sleep(next_frame_time - now)
+        return
+
+    next_frame_time = max(next_frame_time + frame_interval, now)
+
+    # uploads de assets em segundo plano, com orçamento por frame
+    loading = asset_loader.busy()
+    if loading:
+        asset_loader.pump()
+
+    if sim_worker:
+        moving = sim_worker.pending(now)
+    else:
+        advance_simulation(now)
+        moving = sim_active()
+
+    # redesenho a pedido: só há frame se algum campo do estado mudou
+    busy = loading or tracer.enabled
+    if not state.on_demand or state.take_dirty() or busy or (sim_worker and moving):
+        glutPostRedisplay()
+    elif not frame_interval:
+        # sem limitador nem frame para marcar o ritmo: não rodar em vazio
+        time.sleep(SIM_DT)
+
+    if state.on_demand and not busy and not moving:
+        # nada a evoluir: o GLUT fica bloqueado à espera de eventos
+        pause_idle()
+
+def sim_active(sim=state, held=keys):
+    # teclas de movimento pressionadas ou portas a meio da animação
+    if any(held.values()):
+        return True
+    return any(getattr(sim, progress) != (1.0 if getattr(sim, target) else 0.0)
+               for target, progress, _ in ANIMATIONS)
+
+def pause_idle():
+    global idle_armed
+    glutIdleFunc(None)
+    idle_armed = False
+
+def resume_idle():
+    global idle_armed, sim_time, sim_accumulator
+    if idle_armed or not window_visible:
+        return
+    # o relógio da simulação parou com o idle: não recuperar o tempo parado
+    sim_time = None
+    sim_accumulator = 0.0
+    idle_armed = True
+    glutIdleFunc(idle)
 
-        heading = math.radians(state['car_heading'])
+def request_redraw():
+    resume_idle()
+    if window_visible:
+        glutPostRedisplay()
+
+def set_window_visible(visible):
+    global window_visible
+    if visible == window_visible:
+        return
+    window_visible = visible
+    # janela escondida/minimizada: sem frames nem simulação
+    if visible:
+        request_redraw()
+    else:
+        pause_idle()
+
+def window_status(status):
+    set_window_visible(status not in (GLUT_HIDDEN, GLUT_FULLY_COVERED))
+
+def visibility(status):
+    set_window_visible(status == GLUT_VISIBLE)
+
+# ---------- Simulation thread ----------
+# o worker simula sobre o seu próprio State e publica snapshots imutáveis;
+# o display lê o último sem locks e é o único a escrever no state global
+SIM_PUBLISHED = SIM_FIELDS + SIM_TARGETS
+OVERLAP_WINDOW = 120      # frames para as médias de sobreposição
+
+# prev/curr: dois últimos passos; inputs: eventos já aplicados
+SimSnapshot = namedtuple('SimSnapshot', 'sequence time prev curr active inputs')
+
+class SnapshotBuffer:
+    # triplo buffer: o worker escreve no slot seguinte e só depois publica o
+    # índice (uma atribuição); um leitor atrasado apanha, no pior caso, um
+    # snapshot mais recente, nunca um meio escrito
+    def __init__(self, snapshot):
+        self.slots = [snapshot] * 3
+        self.published = 0
+
+    def publish(self, snapshot):
+        index = (self.published + 1) % 3
+        self.slots[index] = snapshot
+        self.published = index
+
+    def latest(self):
+        return self.slots[self.published]
+
+class SimWorker:
+    def __init__(self):
+        self.sim = State()
+        self.sim.update(sim_snapshot(state, SIM_PUBLISHED))
+        self.held = dict.fromkeys(keys, False)
+        self.inputs = queue.SimpleQueue()
+        self.sent = 0          # escrito só pelo thread do GLUT
+        self.received = 0      # escrito só pelo worker
+        self.busy_time = 0.0   # segundos a simular, acumulados
+        self.tick_start = None
+        curr = self.capture()
+        self.buffer = SnapshotBuffer(SimSnapshot(0, time.monotonic(), curr, curr, False, 0))
+        self.thread = threading.Thread(target=self.run, name='simulação', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def send(self, key, pressed):
+        self.sent += 1
+        self.inputs.put((key, pressed))
+
+    def capture(self):
+        return types.MappingProxyType(sim_snapshot(self.sim, SIM_PUBLISHED))
+
+    def drain(self, timeout):
+        try:
+            key, pressed = self.inputs.get(timeout=timeout)
+            while True:
+                sim_key(self.sim, self.held, key, pressed)
+                self.received += 1
+                key, pressed = self.inputs.get_nowait()
+        except queue.Empty:
+            pass
+
+    def run(self):
+        curr = self.buffer.latest().curr
+        sequence = 0
+        next_tick = time.monotonic()
+        while True:
+            if sim_active(self.sim, self.held):
+                # a andar: input chega entre passos sem atrasar o relógio
+                self.drain(max(next_tick - time.monotonic(), 0.0))
+                if time.monotonic() < next_tick:
+                    continue
+            elif self.received == self.buffer.latest().inputs:
+                # parado: bloquear até haver input, sem recuperar o tempo parado
+                self.drain(None)
+                next_tick = time.monotonic()
+
+            self.tick_start = time.perf_counter()
+            prev = curr
+            simulation_step(self.sim, self.held)
+            curr = self.capture()
+            self.busy_time += time.perf_counter() - self.tick_start
+            self.tick_start = None
+
+            sequence += 1
+            self.buffer.publish(SimSnapshot(sequence, time.monotonic(), prev, curr,
+                                            sim_active(self.sim, self.held), self.received))
+
+            # máquina demasiado lenta: descartar o atraso, como MAX_SIM_STEPS
+            next_tick = max(next_tick + SIM_DT, time.monotonic() - MAX_SIM_STEPS * SIM_DT)
+
+    def busy(self):
+        # tempo de simulação até agora, incluindo um passo a meio
+        start = self.tick_start
+        return self.busy_time + (time.perf_counter() - start if start else 0.0)
+
+    def pending(self, now):
+        # ainda há passos a chegar, input por aplicar ou interpolação a meio
+        snapshot = self.buffer.latest()
+        return (snapshot.active or snapshot.inputs != self.sent
+                or now - snapshot.time < SIM_DT)
+
+thread_stats = {'sequence': 0, 'age_ms': 0.0, 'frames': deque(maxlen=OVERLAP_WINDOW)}
+
+def start_sim_worker():
+    global sim_worker
+    sim_worker = SimWorker()
+    sim_worker.start()
+
+def consume_snapshot():
+    # uma leitura de referência; o resto é interpolação no thread do GLUT
+    snapshot = sim_worker.buffer.latest()
+    now = time.monotonic()
+    alpha = min(max((now - snapshot.time) / SIM_DT, 0.0), 1.0)
+    interpolate_sim_state(snapshot.prev, snapshot.curr, alpha)
+    for k in SIM_TARGETS:
+        setattr(state, k, snapshot.curr[k])
+
+    thread_stats['sequence'] = snapshot.sequence
+    thread_stats['age_ms'] = (now - snapshot.time) * 1000.0
+
+def record_overlap(frame_start, sim_start):
+    # tempo de simulação gasto enquanto este frame era desenhado
+    thread_stats['frames'].append((time.perf_counter() - frame_start, sim_worker.busy() - sim_start))
+
+def overlap_summary():
+    frames = thread_stats['frames']
+    if not frames:
+        return 0.0, 0.0, 0.0
+    frame_s = sum(f for f, _ in frames)
+    sim_s = sum(s for _, s in frames)
+    return (frame_s / len(frames) * 1000.0, sim_s / len(frames) * 1000.0,
+            100.0 * sim_s / frame_s if frame_s else 0.0)
+
+# ---------- Asset loading ----------
+# descodificar/gerar em threads; uploads GL no thread principal, aos bocados
+ASSET_WORKERS = 2
+UPLOAD_BUDGET = 0.004          # segundos de uploads GL por frame
+UPLOAD_BAND_BYTES = 1 << 20    # uma textura grande sobe em faixas de linhas
+
+# cor provisória enquanto a textura não chega
+TEXTURE_PLACEHOLDERS = {
+    'ground': (135, 135, 135),
+    'carbon': (25, 25, 25),
+}
 
-        state['car_pos'][0] -= math.sin(heading) * MOVE_STEP
-        state['car_pos'][2] -= math.cos(heading) * MOVE_STEP
+class AssetLoader:
+    def __init__(self, workers=ASSET_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.pending = []
+        self.uploads = deque()
+
+    def submit(self, work, on_ready):
+        # on_ready(resultado) devolve um gerador de passos de upload
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.workers)
+        self.pending.append((self.executor.submit(work), on_ready))
+
+    def busy(self):
+        return bool(self.pending or self.uploads)
+
+    def pump(self, budget=UPLOAD_BUDGET):
+        deadline = time.perf_counter() + budget
+
+        for item in [p for p in self.pending if p[0].done()]:
+            self.pending.remove(item)
+            future, on_ready = item
+            task = on_ready(future.result())
+            if task is not None:
+                self.uploads.append(task)
+
+        while self.uploads and time.perf_counter() < deadline:
+            try:
+                next(self.uploads[0])
+            except StopIteration:
+                self.uploads.popleft()
+
+        if not self.busy() and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def finish(self):
+        while self.busy():
+            if self.pending and not self.uploads:
+                wait([future for future, _ in self.pending], return_when=FIRST_COMPLETED)
+            self.pump(float('inf'))
+
+asset_loader = AssetLoader()
+
+def reserve_texture(name):
+    # textura de 1x1 já com o id final: listas e fila continuam válidas depois do upload
+    texid = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texid)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, 0)
+    color = np.array(TEXTURE_PLACEHOLDERS.get(name, (128, 128, 128)), np.uint8)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB8, 1, 1, 0, GL_RGB, GL_UNSIGNED_BYTE, color)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    textures[name] = texid
+    return texid
 
-        state['wheel_spin'] += WHEEL_SPIN_STEP
+def stream_mip_chain(texid, levels):
+    # do nível mais pequeno para o maior: a textura está sempre completa e vai ganhando detalhe
+    last = len(levels) - 1
+    for level in range(last, -1, -1):
+        pixels = levels[level]
+        height, width = pixels.shape[:2]
+        rows = max(1, UPLOAD_BAND_BYTES // (width * 3))
+
+        glBindTexture(GL_TEXTURE_2D, texid)
+        glTexImage2D(GL_TEXTURE_2D, level, GL_RGB8, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, None)
+        for y in range(0, height, rows):
+            glBindTexture(GL_TEXTURE_2D, texid)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+            band = np.ascontiguousarray(pixels[y:y + rows])
+            glTexSubImage2D(GL_TEXTURE_2D, level, 0, y, width, len(band), GL_RGB, GL_UNSIGNED_BYTE, band)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+            if y + rows < height:
+                glBindTexture(GL_TEXTURE_2D, 0)
+                yield
+
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, level)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, last)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        yield
+
+def upload_step(fn, *args):
+    fn(*args)
+    yield
+
+def load_texture_async(name, make_levels):
+    texid = reserve_texture(name)
+    asset_loader.submit(make_levels, lambda levels: stream_mip_chain(texid, levels))
+
+def start_asset_loading(separate_process=False):
+    kind, params = GROUND_TEXTURE
+    load_texture_async('ground', lambda: procedural_mip_chain(kind, params))
+    load_texture_async('carbon', lambda: file_mip_chain("carbon_fiber.jpg"))
+
+    if separate_process:
+        # até aqui display() usa as display lists / immediate mode
+        asset_loader.submit(lambda: load_or_bake_meshes(True),
+                            lambda baked: upload_step(upload_baked_meshes, baked) if baked else None)
+        return
+
+    # recording() troca os globais GL do módulo: um bake num thread apanharia os
+    # uploads do thread principal, por isso corre aqui, antes de qualquer upload
+    baked = load_or_bake_meshes()
+    if baked is not None:
+        upload_baked_meshes(baked)
 
-    glutPostRedisplay()
 
 # ---------- Init ----------
-def init():
+def init(async_assets=False):
     glClearColor(0.6,0.8,1.0,1.0)
     glEnable(GL_DEPTH_TEST)
     glShadeModel(GL_SMOOTH)
@@ -2380,29 +4641,535 @@ def init():
 
     init_quadric()
 
-    # ground texture
-    img = make_checker_texture(tile_count=16, tile_size=8)
-    load_texture_from_image(img, 'ground')
-
-    img = Image.open("carbon_fiber.jpg").convert("RGB")
-    load_texture_from_image(img, "carbon")
+    # com a janela, os assets chegam durante os primeiros frames
+    start_asset_loading(separate_process=async_assets)
+    if not async_assets:
+        asset_loader.finish()
 
     setup_lights()
 
 
+# ---------- Headless ----------
+def create_egl_context():
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("EGL: não foi possível inicializar o display")
+
+    attribs = [
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE,
+    ]
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    EGL.eglChooseConfig(display, (EGL.EGLint * len(attribs))(*attribs),
+                        ctypes.pointer(config), 1, ctypes.pointer(count))
+    if not count.value:
+        raise RuntimeError("EGL: nenhuma configuração OpenGL disponível")
+
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+
+    # sem superfície: desenhamos sempre para o FBO
+    if not EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context):
+        raise RuntimeError("EGL: não foi possível ativar o contexto")
+    return context
+
+def create_osmesa_context(width, height):
+    from OpenGL import osmesa, arrays
+
+    context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    if not context:
+        raise RuntimeError("OSMesa: não foi possível criar o contexto")
+
+    # o OSMesa precisa de um buffer próprio, mas desenhamos para o FBO
+    buffer = arrays.GLubyteArray.zeros((height, width, 4))
+    if not osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, width, height):
+        raise RuntimeError("OSMesa: não foi possível ativar o contexto")
+    return context, buffer
+
+def headless_bindings():
+    # sem glutInit não há sólidos nem fontes do GLUT
+    return {
+        'glutSolidCube': solid_cube,
+        'glutSolidSphere': solid_sphere,
+        'glutSolidTorus': solid_torus,
+        'glutSwapBuffers': glFinish,
+    }
+
+class HeadlessRenderer:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+        if os.environ.get('PYOPENGL_PLATFORM') == 'osmesa':
+            self.context = create_osmesa_context(width, height)
+        else:
+            self.context = create_egl_context()
+
+        globals().update(headless_bindings())
+
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+        self.color = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+
+        self.depth = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("framebuffer offscreen incompleto")
+
+        init()
+
+        # o HUD usa fontes do GLUT
+        state.show_help = False
+
+    def render(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        display(self.width, self.height)
+        return self.read_pixels()
+
+    def read_pixels(self):
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        pixels = np.frombuffer(data, np.uint8).reshape(self.height, self.width, 3)
+        # OpenGL começa na linha de baixo
+        return pixels[::-1]
+
+    def save_png(self, path):
+        Image.fromarray(self.render()).save(path)
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+RunOptions = namedtuple('RunOptions', 'width height frames out')
+
+def run_options(out, frames=None):
+    # --size LxA, --frames N e --out comuns aos modos sem janela; o resto fica em cada um
+    width, height = WINDOW_W, WINDOW_H
+    if '--size' in sys.argv:
+        width, height = parse_size(sys.argv[sys.argv.index('--size') + 1])
+    if '--frames' in sys.argv:
+        frames = int(sys.argv[sys.argv.index('--frames') + 1])
+    if '--out' in sys.argv:
+        out = sys.argv[sys.argv.index('--out') + 1]
+    return RunOptions(width, height, frames, out)
+
+def run_headless(options):
+    renderer = HeadlessRenderer(options.width, options.height)
+    renderer.save_png(options.out)
+    print(f"{options.out}: {options.width}x{options.height}")
+
+
+# ---------- Render farm ----------
+JOB_FIELDS = {
+    'car_heading': float,
+    'steer_angle': float,
+    'left_door_open': bool,
+    'right_door_open': bool,
+    'garage_open': bool,
+    'camera_mode': int,
+    'cam_azim': float,
+    'cam_elev': float,
+    'cam_dist': float,
+    'wheel_spin': float,
+    'wheel_rotation': float,
+}
+
+farm_renderer = None
+farm_defaults = None
+
+def parse_flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'sim')
+    return bool(value)
+
+def parse_job(row):
+    # aceita car_pos [x, y, z] (JSON) ou car_x/car_y/car_z (CSV)
+    job = {}
+    for key, kind in JOB_FIELDS.items():
+        if row.get(key) not in (None, ''):
+            job[key] = parse_flag(row[key]) if kind is bool else kind(row[key])
+
+    if 'car_pos' in row:
+        job['car_pos'] = [float(v) for v in row['car_pos']]
+    elif any(row.get(k) not in (None, '') for k in ('car_x', 'car_y', 'car_z')):
+        job['car_pos'] = [float(row.get(k) or 0.0) for k in ('car_x', 'car_y', 'car_z')]
+
+    if row.get('name'):
+        job['name'] = row['name']
+    return job
+
+def load_jobs(path):
+    if path.lower().endswith('.csv'):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path) as f:
+            rows = json.load(f)
+    return [parse_job(row) for row in rows]
+
+def init_farm_worker(width, height):
+    # cada processo tem o seu contexto e a sua cópia das malhas
+    global farm_renderer, farm_defaults
+    farm_renderer = HeadlessRenderer(width, height)
+    farm_defaults = state.as_dict()
+
+def render_farm_job(task):
+    index, job, out_dir = task
+
+    state.update(farm_defaults)
+    state.update({k: v for k, v in job.items() if k != 'name'})
+    settle_animations()
+
+    start = time.perf_counter()
+    pixels = farm_renderer.render()
+    render_time = time.perf_counter() - start
+
+    name = job.get('name') or 'frame_%05d' % index
+    path = os.path.join(out_dir, name + '.png')
+    Image.fromarray(pixels).save(path)
+
+    return {
+        'index': index,
+        'file': path,
+        'render_ms': render_time * 1000.0,
+        'total_ms': (time.perf_counter() - start) * 1000.0,
+        'worker': os.getpid(),
+    }
+
+def run_farm(jobs, out_dir, workers, width, height):
+    os.makedirs(out_dir, exist_ok=True)
+
+    # o llvmpipe cria threads próprias; com vários processos competem pelos cores
+    if workers > 1:
+        os.environ.setdefault('LP_NUM_THREADS', '1')
+
+    # gerar a cache das malhas uma vez, antes de arrancar os processos
+    if load_baked_meshes() is None:
+        bake_meshes()
+
+    manifest_path = os.path.join(out_dir, 'manifest.jsonl')
+    tasks = [(i, job, out_dir) for i, job in enumerate(jobs)]
+    start = time.perf_counter()
+
+    with open(manifest_path, 'w') as manifest:
+        manifest.write(json.dumps({'jobs': len(jobs), 'workers': workers,
+                                   'width': width, 'height': height}) + '\n')
+
+        with multiprocessing.Pool(workers, init_farm_worker, (width, height)) as pool:
+            for done, result in enumerate(pool.imap_unordered(render_farm_job, tasks), 1):
+                result['done'] = done
+                result['elapsed_s'] = time.perf_counter() - start
+                manifest.write(json.dumps(result) + '\n')
+                manifest.flush()
+                print(f"[{done}/{len(jobs)}] {result['file']} {result['render_ms']:.1f} ms")
+
+        elapsed = time.perf_counter() - start
+        manifest.write(json.dumps({'elapsed_s': elapsed, 'fps': len(jobs) / elapsed}) + '\n')
+
+    print(f"{len(jobs)} frames em {elapsed:.2f} s ({len(jobs) / elapsed:.1f} frames/s), {manifest_path}")
+
+def run_batch(options):
+    jobs = load_jobs(sys.argv[sys.argv.index('--batch') + 1])
+
+    workers = os.cpu_count() or 1
+    if '--workers' in sys.argv:
+        workers = int(sys.argv[sys.argv.index('--workers') + 1])
+
+    run_farm(jobs, options.out, workers, options.width, options.height)
+
+
+# ---------- Benchmark ----------
+BENCHMARK_FRAMES = 300
+BENCHMARK_WARMUP = 20
+BENCHMARK_THRESHOLD = 0.10   # 10% mais lento que a baseline = regressão
+SIM_STEPS_PER_FRAME = 2      # 120 Hz de simulação a 60 frames/s
+
+# cada frame passa pelo Python uma vez; sólidos GLUT/GLU contam como uma chamada
+DRAW_CALL_NAMES = [
+    'glBegin', 'glCallList', 'glDrawElements', 'glDrawElementsInstanced', 'glDrawArrays',
+    'gluCylinder', 'gluDisk', 'glutSolidCube', 'glutSolidSphere', 'glutSolidTorus',
+]
+
+def bench_straight(frame):
+    keys['w'] = True
+
+def bench_full_lock(frame):
+    keys['w'] = True
+    keys['a' if (frame // 120) % 2 == 0 else 'd'] = True
+
+def bench_doors(frame):
+    if frame % 30 == 0:
+        state.left_door_open = not state.left_door_open
+    if frame % 45 == 0:
+        state.right_door_open = not state.right_door_open
+
+def bench_garage(frame):
+    state.cam_azim = 200.0
+    state.cam_elev = 30.0
+    if frame % 30 == 0:
+        state.garage_open = not state.garage_open
+
+def bench_cameras(frame):
+    keys['w'] = True
+    state.camera_mode = (frame // 40) % 3
+
+CAMERA_MODE_NAMES = ('orbit', 'follow', 'interior')
+
+def zone_scenario(mode, zones):
+    def setup(frame):
+        state.camera_mode = mode
+        state.car_zones = zones
+    return setup
+
+BENCHMARK_SCENARIOS = {
+    'straight': bench_straight,
+    'full_lock': bench_full_lock,
+    'doors': bench_doors,
+    'garage': bench_garage,
+    'cameras': bench_cameras,
+}
+
+class DrawCallCounter:
+    def __init__(self):
+        self.count = 0
+        self.depth = 0
+
+    def wrap(self, fn):
+        # chamadas internas (ex.: solid_cube -> glBegin) não contam duas vezes
+        def counted(*args, **kwargs):
+            if self.depth == 0:
+                self.count += 1
+            self.depth += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.depth -= 1
+        return counted
+
+@contextmanager
+def counting_draw_calls(counter):
+    module = globals()
+    saved = {name: module[name] for name in DRAW_CALL_NAMES}
+    module.update({name: counter.wrap(fn) for name, fn in saved.items()})
+    try:
+        yield counter
+    finally:
+        module.update(saved)
+
+def run_scenario(setup, frames, render):
+    defaults = state.as_dict()
+    counter = DrawCallCounter()
+    frame_ms, cpu_ms, draw_calls, culled, hidden = [], [], [], [], []
+
+    with counting_draw_calls(counter):
+        for frame in range(-BENCHMARK_WARMUP, frames):
+            for k in keys:
+                keys[k] = False
+            setup(frame)
+            for _ in range(SIM_STEPS_PER_FRAME):
+                simulation_step()
+
+            counter.count = 0
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            render()
+            glFinish()
+            if frame >= 0:
+                frame_ms.append((time.perf_counter() - wall) * 1000.0)
+                cpu_ms.append((time.process_time() - cpu) * 1000.0)
+                draw_calls.append(counter.count)
+                culled.append(cull_stats['culled'])
+                hidden.append(zone_stats['triangles'])
+
+    for k in keys:
+        keys[k] = False
+    state.update(defaults)
+
+    ms = np.array(frame_ms)
+    return {
+        'frames': frames,
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'cpu_ms': float(np.mean(cpu_ms)),
+        'draw_calls': float(np.mean(draw_calls)),
+        'culled': float(np.mean(culled)),
+        'hidden_triangles': float(np.mean(hidden)),
+    }
+
+def compare_baseline(results, baseline, threshold):
+    regressions = []
+    print(f"{'cenário':<12}{'média ms':>10}{'baseline':>10}{'variação':>10}")
+    for name, result in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            print(f"{name:<12}{result['mean_ms']:>10.2f}{'-':>10}")
+            continue
+        change = result['mean_ms'] / base['mean_ms'] - 1.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSÃO'
+        print(f"{name:<12}{result['mean_ms']:>10.2f}{base['mean_ms']:>10.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+def run_benchmark(options):
+    frames = options.frames
+    width, height = options.width, options.height
+
+    if '--window' in sys.argv:
+        glutInit(sys.argv)
+        glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGBA | GLUT_DEPTH)
+        glutInitWindowSize(width, height)
+        glutCreateWindow(b"SolucaoCG - benchmark")
+        init()
+
+        def render():
+            glutMainLoopEvent()
+            display(width, height)
+    else:
+        renderer = HeadlessRenderer(width, height)
+
+        def render():
+            glBindFramebuffer(GL_FRAMEBUFFER, renderer.fbo)
+            display(width, height)
+
+    state.show_help = False
+    if '--immediate' in sys.argv:
+        state.compiled_body = False
+
+    results = {
+        'meta': {
+            'frames': frames,
+            'warmup': BENCHMARK_WARMUP,
+            'size': [width, height],
+            'window': '--window' in sys.argv,
+            'compiled_body': state.compiled_body,
+            'renderer': glGetString(GL_RENDERER).decode(),
+        },
+        'scenarios': {},
+    }
+    for name, setup in BENCHMARK_SCENARIOS.items():
+        results['scenarios'][name] = result = run_scenario(setup, frames, render)
+        print(f"{name:<12} média {result['mean_ms']:.2f} ms | p50 {result['p50_ms']:.2f} | "
+              f"p95 {result['p95_ms']:.2f} | p99 {result['p99_ms']:.2f} | "
+              f"CPU {result['cpu_ms']:.2f} ms | {result['draw_calls']:.0f} draw calls")
+
+    # poupança das zonas do carro por modo de câmara
+    if '--zones' in sys.argv:
+        results['zones'] = {}
+        print(f"{'câmara':<10}{'ms sem/com zonas':>20}{'draw calls':>14}{'triângulos poupados':>22}")
+        for mode, name in enumerate(CAMERA_MODE_NAMES):
+            off = run_scenario(zone_scenario(mode, False), frames, render)
+            on = run_scenario(zone_scenario(mode, True), frames, render)
+            results['zones'][name] = {'off': off, 'on': on}
+            print(f"{name:<10}{off['mean_ms']:>10.2f}{on['mean_ms']:>10.2f}"
+                  f"{off['draw_calls']:>7.0f}{on['draw_calls']:>7.0f}{on['hidden_triangles']:>22.0f}")
+
+    with open(options.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('resultados:', options.out)
+
+    if '--baseline' in sys.argv:
+        threshold = BENCHMARK_THRESHOLD
+        if '--threshold' in sys.argv:
+            threshold = float(sys.argv[sys.argv.index('--threshold') + 1])
+        with open(sys.argv[sys.argv.index('--baseline') + 1]) as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(results, baseline, threshold)
+        if regressions:
+            print('regressões:', ', '.join(regressions))
+            sys.exit(1)
+
+
 # ---------- Main ----------
 def main():
+    global scene, frame_interval
+
+    if '--make-scene' in sys.argv:
+        make_scene()
+        return
+
+    if '--scene' in sys.argv:
+        scene = load_scene(sys.argv[sys.argv.index('--scene') + 1])
+
+    if '--capture' in sys.argv:
+        print_capture_stats()
+        return
+
+    if '--textures' in sys.argv:
+        generate_all_textures()
+        return
+
+    if '--bake' in sys.argv:
+        vertices, indices = bake_meshes()
+        print(f"{BAKE_FILE}: {vertices} vértices, {indices} índices")
+        return
+
+    if '--batch' in sys.argv:
+        run_batch(run_options('renders'))
+        return
+
+    if '--benchmark' in sys.argv:
+        run_benchmark(run_options('benchmark.json', BENCHMARK_FRAMES))
+        return
+
+    if '--trace' in sys.argv:
+        run_trace(run_options('trace', TRACE_FRAMES))
+        return
+
+    if '--headless' in sys.argv:
+        run_headless(run_options('frame.png'))
+        return
+
+    fps = FRAME_CAP
+    if '--fps' in sys.argv:
+        fps = float(sys.argv[sys.argv.index('--fps') + 1])
+
     glutInit(sys.argv)
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGBA | GLUT_DEPTH)
     glutInitWindowSize(WINDOW_W, WINDOW_H)
     glutCreateWindow(b"SolucaoCG - Projeto CG 2025")
 
-    init()
+    init(async_assets=True)
+
+    # com vsync o glutSwapBuffers já marca o ritmo
+    if '--vsync' in sys.argv and enable_vsync():
+        fps = 0
+    frame_interval = 1.0 / fps if fps > 0 else 0.0
+
+    if '--continuous' in sys.argv:
+        state.on_demand = False
+
+    # simulação e input num thread à parte; --single-thread volta ao idle()
+    if '--single-thread' not in sys.argv:
+        start_sim_worker()
+
     glutDisplayFunc(display)
-    glutIdleFunc(idle)
     glutKeyboardFunc(keyboard)
     glutSpecialFunc(special_input)
     glutKeyboardUpFunc(keyboard_up)
+    # freeglut distingue minimizada/tapada; o GLUT clássico só tem visibilidade
+    try:
+        glutWindowStatusFunc(window_status)
+    except Exception:
+        glutVisibilityFunc(visibility)
+    resume_idle()
 
 
     glutMainLoop()